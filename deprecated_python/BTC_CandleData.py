@@ -0,0 +1,539 @@
+import csv
+import hashlib
+import json
+import os
+import struct
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from dataclasses import dataclass, fields, replace
+from functools import cached_property
+from itertools import islice, repeat
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from BTC_RangeIndex import CandleRangeIndex
+
+# CSV header -> (CandleColumns field, dtype)
+CSV_COLUMNS = {
+    'unix': ('unix_time', np.int64),
+    'date': ('date', 'datetime64[s]'),
+    'open': ('open_price', np.float64),
+    'high': ('high', np.float64),
+    'low': ('low', np.float64),
+    'close': ('close', np.float64),
+    'Volume BTC': ('volume_btc', np.float64),
+    'Volume USDT': ('volume_usdt', np.float64),
+    'buyTakerAmount': ('buy_taker_amount', np.float64),
+    'buyTakerQuantity': ('buy_taker_quantity', np.float64),
+    'tradeCount': ('trade_count', np.int64),
+    'weightedAverage': ('weighted_average', np.float64),
+}
+COLUMN_NAMES = tuple(field for field, _ in CSV_COLUMNS.values())
+
+
+@dataclass(eq=False)
+class CandleColumns:
+    # Columns left out of a projected load stay None. Compared by identity, as ndarray fields have
+    # no single truth value and cached properties hang off each instance
+    unix_time: Optional[np.ndarray] = None
+    date: Optional[np.ndarray] = None
+    open_price: Optional[np.ndarray] = None
+    high: Optional[np.ndarray] = None
+    low: Optional[np.ndarray] = None
+    close: Optional[np.ndarray] = None
+    volume_btc: Optional[np.ndarray] = None
+    volume_usdt: Optional[np.ndarray] = None
+    buy_taker_amount: Optional[np.ndarray] = None
+    buy_taker_quantity: Optional[np.ndarray] = None
+    trade_count: Optional[np.ndarray] = None
+    weighted_average: Optional[np.ndarray] = None
+    symbol: str = ''
+
+    def __len__(self) -> int:
+        names = self.column_names()
+        return len(getattr(self, names[0])) if names else 0
+
+    def column_names(self) -> List[str]:
+        # The loaded columns only
+        return [field.name for field in fields(self)
+                if field.name != 'symbol' and getattr(self, field.name) is not None]
+
+    def slice(self, start: Optional[int] = None, stop: Optional[int] = None) -> 'CandleColumns':
+        # Basic slicing of every column, the result shares memory with this one
+        return replace(self, **{name: getattr(self, name)[start:stop] for name in self.column_names()})
+
+    @cached_property
+    def all_time_high(self) -> np.ndarray:
+        # Running maximum of high, it doesn't depend on any trading parameter so it is
+        # computed once per dataset and shared by every backtest over it
+        return np.maximum.accumulate(self.high)
+
+    @cached_property
+    def new_high_indices(self) -> np.ndarray:
+        # Bars whose high exceeds every earlier one, the only bars where the all-time high moves
+        running_highs = self.all_time_high
+        return np.flatnonzero(np.diff(running_highs, prepend=-np.inf) > 0)
+
+    @property
+    def memory_mapped(self) -> bool:
+        # Backed by a candle store on disk, possibly larger than RAM, so per-bar arrays such as
+        # all_time_high or range_index shouldn't be built over it
+        return isinstance(self.high, np.memmap)
+
+    @cached_property
+    def range_index(self) -> CandleRangeIndex:
+        # Two segment trees of about twice the bar count each, in memory
+        return CandleRangeIndex(self.high, self.low)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        # Hash of the highs and lows, all a backtest's trades depend on. The same for equal candles
+        # whether they came from the CSV, the cache or a store, and whatever else was loaded
+        digest = hashlib.sha256()
+        for values in (self.high, self.low):
+            values = np.ascontiguousarray(values)
+            digest.update(f"{values.dtype.str}:{len(values)};".encode())
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
+
+# Sidecar cache written next to the source CSV, bump the version when the layout changes
+CACHE_SUFFIX = '.cache.npz'
+CACHE_VERSION = 4
+
+# Bytes at the end of a cached CSV that must be unchanged for rows appended later to be added to
+# the cache instead of parsing the whole file again
+CACHE_TAIL_BYTES = 4096
+
+# Fixed-layout candle store: a 64 byte header followed by packed little-endian records,
+# one per candle, so every field can be memory-mapped as a strided view. The header holds
+# magic, version, record size, row count, symbol, and for stores ingested from a CSV the
+# byte offset and unix time of the last ingested row (zero otherwise)
+STORE_MAGIC = b'BTCCNDL1'
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct('<8sIIQ16sQq8x')
+STORE_RECORD = np.dtype([(field, np.dtype(dtype).newbyteorder('<')) for field, dtype in CSV_COLUMNS.values()])
+
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def unix_to_datetime(unix_time: int) -> datetime:
+    # Naive UTC, the same value strptime gives for the exported date column
+    return _UNIX_EPOCH + timedelta(milliseconds=unix_time)
+
+
+def unix_to_datetime64(unix_time: np.ndarray) -> np.ndarray:
+    return (unix_time // 1000).astype('datetime64[s]')
+
+
+def check_dates(columns: CandleColumns):
+    mismatched = np.flatnonzero(columns.date != unix_to_datetime64(columns.unix_time))
+    if len(mismatched):
+        row = mismatched[0]
+        raise ValueError(f"Row {row}: date {columns.date[row]} does not match unix time {columns.unix_time[row]}")
+
+
+# How each column combines over the candles of a longer bar
+RESAMPLE_FIRST = ('unix_time', 'date', 'open_price')
+RESAMPLE_SUM = ('volume_btc', 'volume_usdt', 'buy_taker_amount', 'buy_taker_quantity', 'trade_count')
+
+
+def resample_columns(columns: CandleColumns, seconds: int) -> CandleColumns:
+    # Merges consecutive candles into bars of the given length aligned to the epoch (e.g. 14400
+    # for 4h, 86400 for UTC days): first open, highest high, lowest low, last close, summed
+    # volumes and the volume-weighted average price. Needs unix_time or date for bar boundaries,
+    # weighted_average is only kept when volume_btc is loaded too
+    if columns.unix_time is not None:
+        times = columns.unix_time // 1000
+    elif columns.date is not None:
+        times = columns.date.astype(np.int64)
+    else:
+        raise ValueError("Resampling needs the unix_time or date column")
+    if len(columns) == 0:
+        return columns.slice(0, 0)
+
+    buckets = times // seconds
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    ends = np.append(starts[1:], len(buckets)) - 1
+    resampled = {}
+    for name in columns.column_names():
+        values = getattr(columns, name)
+        if name in RESAMPLE_FIRST:
+            resampled[name] = values[starts]
+        elif name == 'high':
+            resampled[name] = np.maximum.reduceat(values, starts)
+        elif name == 'low':
+            resampled[name] = np.minimum.reduceat(values, starts)
+        elif name == 'close':
+            resampled[name] = values[ends]
+        elif name in RESAMPLE_SUM:
+            resampled[name] = np.add.reduceat(values, starts)
+    if columns.weighted_average is not None and columns.volume_btc is not None:
+        volume = resampled['volume_btc']
+        traded = np.add.reduceat(columns.weighted_average * columns.volume_btc, starts)
+        resampled['weighted_average'] = np.where(volume > 0, traded / np.where(volume > 0, volume, 1),
+                                                 columns.weighted_average[ends])
+    return CandleColumns(symbol=columns.symbol, **resampled)
+
+
+def _read_header(filename: str) -> Tuple[List[str], str]:
+    with open(filename, 'r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        first_row = next(reader, None)
+    if header is None:
+        raise ValueError(f"{filename} has no CSV header")
+    missing = [name for name in CSV_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"{filename} is missing columns: {', '.join(missing)}")
+    symbol = first_row[header.index('symbol')] if first_row and 'symbol' in header else ''
+    return header, symbol
+
+
+def file_digest(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _tail_digest(filename: str, size: int) -> str:
+    # Hash of the last CACHE_TAIL_BYTES of the first size bytes
+    with open(filename, 'rb') as file:
+        file.seek(max(0, size - CACHE_TAIL_BYTES))
+        return hashlib.sha256(file.read(min(size, CACHE_TAIL_BYTES))).hexdigest()
+
+
+def _read_cache(filename: str, cache_path: str, verify: bool, text_dates: bool,
+                columns: Tuple[str, ...]) -> Optional[CandleColumns]:
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            source = json.loads(str(npz['__source__']))
+            stat = os.stat(filename)
+            if source['version'] != CACHE_VERSION or source['size'] != stat.st_size:
+                return None
+            if text_dates and source['dates'] != 'text':
+                return None
+            if not set(columns) <= set(source['columns']):
+                return None
+            # A matching size and mtime is trusted, anything else has to match the content hash
+            if verify or source['mtime_ns'] != stat.st_mtime_ns:
+                if source['sha256'] != file_digest(filename):
+                    return None
+            if source['mtime_ns'] != stat.st_mtime_ns:
+                # Same content under a new mtime (e.g. a fresh checkout), re-key so the next load skips hashing
+                source['mtime_ns'] = stat.st_mtime_ns
+                cached = CandleColumns(symbol=source['symbol'], **{name: npz[name] for name in source['columns']})
+                _write_cache(cached, cache_path, source)
+            # Members of an npz are only read when accessed, so projected columns are never loaded
+            return CandleColumns(symbol=source['symbol'], **{name: npz[name] for name in columns})
+    except (KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        # A truncated or corrupt cache is a miss, the CSV gets parsed again
+        return None
+    except OSError:
+        if not os.path.exists(filename):
+            raise
+        return None
+
+
+def _extend_cache(filename: str, cache_path: str, text_dates: bool,
+                  columns: Tuple[str, ...]) -> Optional[CandleColumns]:
+    # Adds the rows an append-only CSV gained since it was cached, parsing only those. None when
+    # the cache doesn't cover the projection, or the CSV didn't just grow past a complete last row
+    # whose tail is unchanged. The extended cache is keyed by size and mtime, its content hash is
+    # left unknown as computing it would read the whole file again
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            source = json.loads(str(npz['__source__']))
+            stat = os.stat(filename)
+            if source['version'] != CACHE_VERSION or not 0 < source['size'] < stat.st_size:
+                return None
+            if (text_dates and source['dates'] != 'text') or not set(columns) <= set(source['columns']):
+                return None
+            if _tail_digest(filename, source['size']) != source['tail']:
+                return None
+            cached = {name: npz[name] for name in source['columns']}
+    except (KeyError, ValueError, EOFError, zipfile.BadZipFile, OSError):
+        return None
+
+    with open(filename, 'rb') as file:
+        file.seek(source['size'] - 1)
+        if file.read(1) != b'\n':
+            return None
+        lines = file.read(stat.st_size - source['size']).decode().splitlines()
+    if any(lines):
+        header, _ = _read_header(filename)
+        dates_from_unix = source['dates'] == 'unix'
+        records = _parse_records(lines, header, dates_from_unix=dates_from_unix, columns=tuple(cached))
+        appended = _columns_from_records(records, source['symbol'], copy=False)
+        cached = {name: np.concatenate([values, getattr(appended, name)]) for name, values in cached.items()}
+
+    source.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=None,
+                  tail=_tail_digest(filename, stat.st_size))
+    _write_cache(CandleColumns(symbol=source['symbol'], **cached), cache_path, source)
+    return CandleColumns(symbol=source['symbol'], **{name: cached[name] for name in columns})
+
+
+def _reusable_cache(cache_path: str, stat: os.stat_result, sha256: str, verify: bool,
+                    text_dates: bool) -> Tuple[dict, str, str]:
+    # The columns, symbol and date source of a cache that missed only on its projection or mtime,
+    # nothing if it belongs to other content. An extended cache has no content hash, it is reused
+    # on a matching size and mtime unless verifying. Dates derived from unix time are dropped when
+    # text dates are required
+    try:
+        with np.load(cache_path, allow_pickle=False) as npz:
+            source = json.loads(str(npz['__source__']))
+            if source['version'] != CACHE_VERSION or source['size'] != stat.st_size:
+                return {}, '', ''
+            trusted = source['sha256'] is None and not verify and source['mtime_ns'] == stat.st_mtime_ns
+            if source['sha256'] != sha256 and not trusted:
+                return {}, '', ''
+            names = [name for name in source['columns']
+                     if name != 'date' or not text_dates or source['dates'] == 'text']
+            return {name: npz[name] for name in names}, source['symbol'], source['dates']
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        return {}, '', ''
+
+
+def _write_cache(columns: CandleColumns, cache_path: str, source: dict):
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            np.savez(file, __source__=np.array(json.dumps(source)),
+                     **{name: getattr(columns, name) for name in columns.column_names()})
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # The cache is an optimization only, a read-only data directory must not break loading
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _projection(columns: Optional[Iterable[str]], dates_from_unix: bool) -> Tuple[str, ...]:
+    if columns is None:
+        return COLUMN_NAMES
+    columns = set(columns)
+    unknown = columns - set(COLUMN_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown candle columns: {', '.join(sorted(unknown))}")
+    if 'date' in columns and dates_from_unix:
+        columns.add('unix_time')
+    return tuple(name for name in COLUMN_NAMES if name in columns)
+
+
+def load_btc_columns(filename: str, columns: Optional[Iterable[str]] = None, use_cache: bool = True,
+                     verify_cache: bool = False, dates_from_unix: bool = False,
+                     check_dates_against_unix: bool = False, workers: int = 1) -> CandleColumns:
+    # With dates_from_unix the date text is never parsed, checking needs it parsed regardless
+    dates_from_unix = dates_from_unix and not check_dates_against_unix
+    if check_dates_against_unix:
+        columns = set(columns or COLUMN_NAMES) | {'unix_time', 'date'}
+    columns = _projection(columns, dates_from_unix)
+
+    if not use_cache:
+        loaded = _parse_btc_columns(filename, dates_from_unix, columns, workers)
+    else:
+        cache_path = filename + CACHE_SUFFIX
+        loaded = _read_cache(filename, cache_path, verify_cache, check_dates_against_unix, columns)
+        if loaded is None and not verify_cache:
+            loaded = _extend_cache(filename, cache_path, check_dates_against_unix, columns)
+        if loaded is None:
+            stat = os.stat(filename)
+            digest = file_digest(filename)
+            # Columns already cached for the same content are kept, only the missing ones are parsed
+            cached, symbol, dates = _reusable_cache(cache_path, stat, digest, verify_cache, check_dates_against_unix)
+            missing = _projection(set(columns) - set(cached), dates_from_unix) if set(columns) - set(cached) else ()
+            if missing:
+                parsed = _parse_btc_columns(filename, dates_from_unix, missing, workers)
+                cached.update({name: getattr(parsed, name) for name in parsed.column_names()})
+                symbol = parsed.symbol
+                if 'date' in missing:
+                    dates = 'unix' if dates_from_unix else 'text'
+            merged = CandleColumns(symbol=symbol, **cached)
+            source = {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                      'sha256': digest, 'tail': _tail_digest(filename, stat.st_size),
+                      'dates': dates or ('unix' if dates_from_unix else 'text'),
+                      'columns': merged.column_names(), 'symbol': symbol}
+            _write_cache(merged, cache_path, source)
+            loaded = CandleColumns(symbol=symbol, **{name: cached[name] for name in columns})
+
+    if check_dates_against_unix:
+        check_dates(loaded)
+    return loaded
+
+
+def _parse_records(lines: Iterable[str], header: List[str], skiprows: int = 0,
+                   dates_from_unix: bool = False, columns: Tuple[str, ...] = COLUMN_NAMES) -> np.ndarray:
+    # Only the projected columns are converted and allocated
+    names = [name for name, (field, _) in CSV_COLUMNS.items()
+             if field in columns and not (dates_from_unix and field == 'date')]
+    usecols = [header.index(name) for name in names]
+    dtype = [(CSV_COLUMNS[name][0], STORE_RECORD[CSV_COLUMNS[name][0]]) for name in names]
+    return np.loadtxt(lines, delimiter=',', skiprows=skiprows, usecols=usecols, dtype=dtype, ndmin=1)
+
+
+def _columns_from_records(records: np.ndarray, symbol: str, copy: bool) -> CandleColumns:
+    if copy:
+        columns = {name: np.ascontiguousarray(records[name]) for name in records.dtype.names}
+    else:
+        columns = {name: records[name] for name in records.dtype.names}
+    if 'date' not in columns and 'unix_time' in columns:
+        columns['date'] = unix_to_datetime64(columns['unix_time'])
+    return CandleColumns(symbol=symbol, **columns)
+
+
+def _store_records(columns: CandleColumns) -> np.ndarray:
+    missing = set(COLUMN_NAMES) - set(columns.column_names())
+    if missing:
+        raise ValueError(f"Candle stores hold every column, missing: {', '.join(sorted(missing))}")
+    records = np.empty(len(columns), dtype=STORE_RECORD)
+    for name in STORE_RECORD.names:
+        records[name] = getattr(columns, name)
+    return records
+
+
+def _parse_btc_columns(filename: str, dates_from_unix: bool = False,
+                       columns: Tuple[str, ...] = COLUMN_NAMES, workers: int = 1) -> CandleColumns:
+    # Parse the columns in bulk into one contiguous array per field,
+    # skipping the per-row BTCData objects entirely
+    header, symbol = _read_header(filename)
+    ranges = _line_aligned_ranges(filename, workers * 4) if workers > 1 else []
+    if len(ranges) < 2:
+        records = _parse_records(filename, header, skiprows=1, dates_from_unix=dates_from_unix, columns=columns)
+        return _columns_from_records(records, symbol, copy=True)
+
+    # Each worker parses its own byte range, results come back in file order
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(_parse_byte_range, repeat(filename), *zip(*ranges), repeat(header),
+                                  repeat(dates_from_unix), repeat(columns)))
+    return _columns_from_records(np.concatenate(parts), symbol, copy=True)
+
+
+# Smallest byte range worth shipping to another process
+PARALLEL_MIN_RANGE = 4 * 1024 * 1024
+
+
+def _line_aligned_ranges(filename: str, count: int) -> List[Tuple[int, int]]:
+    # Splits the rows after the header into byte ranges that start and end on line boundaries
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as file:
+        file.readline()
+        start = file.tell()
+        count = max(1, min(count, (size - start) // PARALLEL_MIN_RANGE))
+        boundaries = [start]
+        for index in range(1, count):
+            file.seek(max(start + (size - start) * index // count, boundaries[-1]))
+            file.readline()
+            boundaries.append(file.tell())
+    boundaries.append(size)
+    return [(begin, end) for begin, end in zip(boundaries, boundaries[1:]) if end > begin]
+
+
+def _parse_byte_range(filename: str, start: int, stop: int, header: List[str], dates_from_unix: bool,
+                      columns: Tuple[str, ...]) -> np.ndarray:
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        lines = file.read(stop - start).decode().splitlines()
+    return _parse_records(lines, header, dates_from_unix=dates_from_unix, columns=columns)
+
+
+def _write_store_header(file, count: int, symbol: str, source_offset: int = 0, last_unix: int = 0):
+    file.seek(0)
+    file.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, STORE_RECORD.itemsize, count,
+                                 symbol.encode()[:16], source_offset, last_unix))
+
+
+def _read_store_header(path: str) -> Tuple[int, str, int, int]:
+    with open(path, 'rb') as file:
+        header = file.read(STORE_HEADER.size)
+    if len(header) < STORE_HEADER.size:
+        raise ValueError(f"{path} is not a candle store")
+    magic, version, record_size, count, symbol, source_offset, last_unix = STORE_HEADER.unpack(header)
+    if magic != STORE_MAGIC or version != STORE_VERSION or record_size != STORE_RECORD.itemsize:
+        raise ValueError(f"{path} is not a version {STORE_VERSION} candle store")
+    return count, symbol.rstrip(b'\0').decode(), source_offset, last_unix
+
+
+def write_candle_store(columns: CandleColumns, path: str):
+    records = _store_records(columns)
+    with open(path, 'wb') as file:
+        _write_store_header(file, len(records), columns.symbol)
+        records.tofile(file)
+
+
+def csv_to_candle_store(filename: str, path: str, chunk_rows: int = 1_000_000, dates_from_unix: bool = False):
+    # Converts chunk by chunk, so the CSV never has to fit in memory
+    header, symbol = _read_header(filename)
+    with open(path, 'wb') as file:
+        _write_store_header(file, 0, symbol)
+    _append_csv_rows(filename, path, header, chunk_rows, dates_from_unix, complete_lines_only=False)
+
+
+def _append_csv_rows(filename: str, path: str, header: List[str], chunk_rows: int, dates_from_unix: bool,
+                     complete_lines_only: bool = True):
+    # Appends the CSV rows past the store's source offset, dropping rows not newer than the last
+    # ingested unix time. With complete_lines_only an unterminated last line is left for the next
+    # refresh since it may still be being written, a full conversion takes it as the final row
+    count, symbol, source_offset, last_unix = _read_store_header(path)
+    with open(filename, 'rb') as source, open(path, 'r+b') as file:
+        if source_offset:
+            source.seek(source_offset)
+        else:
+            source.readline()
+            source_offset = source.tell()
+        file.seek(STORE_HEADER.size + count * STORE_RECORD.itemsize)
+        while chunk := list(islice(source, chunk_rows)):
+            if complete_lines_only and not chunk[-1].endswith(b'\n'):
+                chunk.pop()
+            source_offset += sum(map(len, chunk))
+            if not chunk:
+                break
+            records = _parse_records(b''.join(chunk).decode().splitlines(), header, dates_from_unix=dates_from_unix)
+            if dates_from_unix:
+                records = _store_records(_columns_from_records(records, symbol, copy=False))
+            records = records[records['unix_time'] > last_unix]
+            if len(records):
+                records.tofile(file)
+                count += len(records)
+                last_unix = int(records['unix_time'][-1])
+        _write_store_header(file, count, symbol, source_offset, last_unix)
+
+
+def refresh_candle_store(filename: str, path: str, columns: Optional[Iterable[str]] = None,
+                         chunk_rows: int = 1_000_000, dates_from_unix: bool = False) -> CandleColumns:
+    # Brings the store at path up to date with an append-only CSV in O(new rows), falling back to
+    # a full conversion when the store is missing, wasn't built from a CSV, or the CSV was rewritten
+    header, _ = _read_header(filename)
+    rebuild = not os.path.exists(path)
+    if not rebuild:
+        _, _, source_offset, _ = _read_store_header(path)
+        rebuild = source_offset == 0 or source_offset > os.path.getsize(filename)
+        if not rebuild and source_offset < os.path.getsize(filename):
+            # An ingested row must have ended in a newline, otherwise the CSV changed under it
+            with open(filename, 'rb') as source:
+                source.seek(source_offset - 1)
+                rebuild = source.read(1) != b'\n'
+
+    if rebuild:
+        csv_to_candle_store(filename, path, chunk_rows, dates_from_unix)
+    else:
+        _append_csv_rows(filename, path, header, chunk_rows, dates_from_unix)
+    return open_candle_store(path, columns)
+
+
+def open_candle_store(path: str, columns: Optional[Iterable[str]] = None) -> CandleColumns:
+    # Every column is a zero-copy view into the memory-mapped file, pages are only
+    # read when touched and the OS page cache decides what stays resident
+    count, symbol, _, _ = _read_store_header(path)
+    if count:
+        records = np.memmap(path, dtype=STORE_RECORD, mode='r', offset=STORE_HEADER.size, shape=(count,))
+    else:
+        records = np.empty(0, dtype=STORE_RECORD)
+    loaded = _columns_from_records(records, symbol, copy=False)
+    if columns is None:
+        return loaded
+    columns = _projection(columns, dates_from_unix=False)
+    return CandleColumns(symbol=loaded.symbol, **{name: getattr(loaded, name) for name in columns})
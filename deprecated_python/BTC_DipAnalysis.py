@@ -1,11 +1,35 @@
 import csv
 import math
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, fields
 from datetime import datetime
-from typing import List, Tuple
+from itertools import islice, repeat
+from typing import Collection, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
+from BTC_CandleData import CandleColumns, load_btc_columns, unix_to_datetime
+from BTC_DipEngine import DipTraderState, DipTradingStats, analyze_dip_events, check_parameters, dip_trading_stats
 
-@dataclass
+# BTCData field -> (CSV column, converter), the date is decoded separately
+CSV_FIELDS = {
+    'unix_time': ('unix', int),
+    'symbol': ('symbol', sys.intern),
+    'open_price': ('open', float),
+    'high': ('high', float),
+    'low': ('low', float),
+    'close': ('close', float),
+    'volume_btc': ('Volume BTC', float),
+    'volume_usdt': ('Volume USDT', float),
+    'buy_taker_amount': ('buyTakerAmount', float),
+    'buy_taker_quantity': ('buyTakerQuantity', float),
+    'trade_count': ('tradeCount', int),
+    'weighted_average': ('weightedAverage', float),
+}
+
+# The only fields analyze_dips_and_trade reads, pass as columns= to skip parsing the rest
+ANALYZE_COLUMNS = ('date', 'high', 'low')
+
+
+@dataclass(slots=True)
 class BTCData:
     unix_time: int
     date: datetime
@@ -22,11 +46,23 @@ class BTCData:
     weighted_average: float
 
     @classmethod
-    def from_csv_row(cls, row: dict) -> 'BTCData':
+    def from_csv_row(cls, row: dict, dates_from_unix: bool = False, check_dates_against_unix: bool = False,
+                     columns: Optional[Collection[str]] = None) -> 'BTCData':
+        if columns is not None:
+            # Fields outside the projection are left as None
+            values = dict.fromkeys(BTC_DATA_FIELDS)
+            for name in columns:
+                if name == 'date':
+                    values['date'] = cls._date_from_csv_row(row, dates_from_unix, check_dates_against_unix)
+                else:
+                    column, convert = CSV_FIELDS[name]
+                    values[name] = convert(row[column])
+            return cls(**values)
+
         return cls(
             unix_time=int(row['unix']),
-            date=datetime.strptime(row['date'], '%Y-%m-%d %H:%M:%S'),
-            symbol=row['symbol'],
+            date=cls._date_from_csv_row(row, dates_from_unix, check_dates_against_unix),
+            symbol=sys.intern(row['symbol']),
             open_price=float(row['open']),
             high=float(row['high']),
             low=float(row['low']),
@@ -39,82 +75,211 @@ class BTCData:
             weighted_average=float(row['weightedAverage'])
         )
 
+    @staticmethod
+    def _date_from_csv_row(row: dict, dates_from_unix: bool, check_dates_against_unix: bool) -> datetime:
+        if dates_from_unix and not check_dates_against_unix:
+            # Skips the comparatively expensive strptime, unix already carries the same instant
+            return unix_to_datetime(int(row['unix']))
+        date = datetime.strptime(row['date'], '%Y-%m-%d %H:%M:%S')
+        if check_dates_against_unix and date != unix_to_datetime(int(row['unix'])):
+            raise ValueError(f"Date {row['date']} does not match unix time {row['unix']}")
+        return date
+
+
+BTC_DATA_FIELDS = tuple(field.name for field in fields(BTCData))
+
+
+def analyze_dips_and_trade(data: Union[Iterable[BTCData], CandleColumns], dip_fraction: float, profit_fraction: float,
+                           dollar_amount: float, sell_fraction: float,
+                           state: Optional[DipTraderState] = None,
+                           stats: Optional[DipTradingStats] = None) -> Tuple[List[dict], List[dict]]:
+    check_parameters(dip_fraction, profit_fraction, sell_fraction)
 
-def analyze_dips_and_trade(data: List[BTCData], dip_fraction: float, profit_fraction: float,
-                           dollar_amount: float, sell_fraction: float) -> Tuple[List[dict], List[dict]]:
-    if not 0 < dip_fraction < 1:
-        raise ValueError("Dip fraction must be between 0 and 1")
-    if profit_fraction <= 1:
-        raise ValueError("Profit fraction must be greater than 1")
-    if not 0 < sell_fraction <= 1:
-        raise ValueError("Sell fraction must be between 0 and 1")
+    if isinstance(data, CandleColumns):
+        return analyze_dip_events(data, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state, stats)
 
+    # The rules live in DipTrader, a given state is resumed from and updated in place
+    trader = DipTrader(dip_fraction, profit_fraction, dollar_amount, sell_fraction, state, stats)
     purchases = []
     sales = []
-    all_time_high = 0.0
-    current_btc_holdings = 0.0
-    sell_target = 0.0
-    allow_purchase = False
-    ready_to_sell = False
+    for row in data:
+        for side, trade in trader.on_bar(row):
+            (sales if side == 'sell' else purchases).append(trade)
+    return purchases, sales
 
+
+def summarize_dips_and_trade(data: Union[Iterable[BTCData], CandleColumns], dip_fraction: float,
+                             profit_fraction: float, dollar_amount: float, sell_fraction: float,
+                             state: Optional[DipTraderState] = None) -> DipTradingStats:
+    # Totals of analyze_dips_and_trade without building the trade lists, rows only update scalars
+    if isinstance(data, CandleColumns):
+        return dip_trading_stats(data, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state)
+    stats = DipTradingStats()
+    step = DipTrader(dip_fraction, profit_fraction, dollar_amount, sell_fraction, state, stats).step
     for row in data:
+        step(row.high, row.low)
+    return stats
+
+
+class DipTrader:
+    # The analyze_dips_and_trade rules applied one bar at a time, for driving from a live candle feed.
+    # analyze_dips_and_trade runs its rows through one as well. A given stats gets the totals
+
+    def __init__(self, dip_fraction: float, profit_fraction: float, dollar_amount: float, sell_fraction: float,
+                 state: Optional[DipTraderState] = None, stats: Optional[DipTradingStats] = None):
+        check_parameters(dip_fraction, profit_fraction, sell_fraction)
+        self.dip_fraction = dip_fraction
+        self.profit_fraction = profit_fraction
+        self.dollar_amount = dollar_amount
+        self.sell_fraction = sell_fraction
+        self.state = state or DipTraderState()
+        self.stats = stats
+
+    def step(self, high: float, low: float) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+        # Applies one bar. Returns the sale as (BTC sold, BTC remaining) and the purchase as
+        # (BTC bought, BTC held after), each None when the bar didn't trigger it
+        state = self.state
+        stats = self.stats
+        sale = None
+        purchase = None
+        state.bars_processed += 1
+
         # Update all-time high if we see a new one
-        if row.high > all_time_high:
-            all_time_high = row.high
-            allow_purchase = True
+        if high > state.all_time_high:
+            state.all_time_high = high
+            state.allow_purchase = True
 
         # Check for selling conditions first
-        if ready_to_sell and current_btc_holdings > 0:
-            if row.high >= sell_target:
-                # Sell specified fraction of current BTC holdings
-                btc_to_sell = current_btc_holdings * sell_fraction
-                dollars_received = btc_to_sell * row.high
-                sales.append({
-                    'date': row.date,
-                    'price': row.high,
-                    'all_time_high': all_time_high,
-                    'btc_sold': btc_to_sell,
-                    'dollars_received': dollars_received,
-                    'btc_remaining': current_btc_holdings - btc_to_sell
-                })
-                current_btc_holdings -= btc_to_sell
-                ready_to_sell = False
-                allow_purchase = True  # Allow new purchase after selling
+        if state.ready_to_sell and state.current_btc_holdings > 0 and high >= state.sell_target:
+            # Sell specified fraction of current BTC holdings
+            btc_to_sell = state.current_btc_holdings * self.sell_fraction
+            state.current_btc_holdings -= btc_to_sell
+            sale = (btc_to_sell, state.current_btc_holdings)
+            state.sales_made += 1
+            state.ready_to_sell = False
+            state.allow_purchase = True  # Allow new purchase after selling
+            if stats is not None:
+                stats.sales_made += 1
+                stats.total_btc_sold += btc_to_sell
+                stats.total_received += btc_to_sell * high
 
         # Check for buying conditions
-        dip_target = all_time_high * dip_fraction
-        if allow_purchase and row.low <= dip_target:
+        if state.allow_purchase and low <= state.all_time_high * self.dip_fraction:
             # Calculate how much BTC we can buy with our dollar amount
-            purchase_amount = dollar_amount * math.log2(len(sales) + 2)
-            btc_amount = purchase_amount / row.low
-            purchases.append({
-                'date': row.date,
-                'price': row.low,
-                'all_time_high': all_time_high,
-                'btc_purchased': btc_amount,
-                'dollars_spent': dollar_amount,
-                'total_btc_after_purchase': current_btc_holdings + btc_amount
-            })
-            current_btc_holdings += btc_amount
-            allow_purchase = False
-            ready_to_sell = True  # Enable selling after purchase
-            sell_target = all_time_high * profit_fraction
+            purchase_amount = self.dollar_amount * math.log2(state.sales_made + 2)
+            btc_amount = purchase_amount / low
+            state.current_btc_holdings += btc_amount
+            purchase = (btc_amount, state.current_btc_holdings)
+            state.allow_purchase = False
+            state.ready_to_sell = True  # Enable selling after purchase
+            state.sell_target = state.all_time_high * self.profit_fraction
+            if stats is not None:
+                stats.purchases_made += 1
+                stats.total_btc_bought += btc_amount
+                stats.total_spent += self.dollar_amount
 
-    return purchases, sales
+        return sale, purchase
+
+    def on_bar(self, bar: BTCData) -> List[Tuple[str, dict]]:
+        # Returns the trades this bar triggered as ('sell', sale) and/or ('buy', purchase), in that
+        # order, with the same dicts analyze_dips_and_trade puts in its sales and purchases
+        sale, purchase = self.step(bar.high, bar.low)
+        if sale is None and purchase is None:
+            return []
+        events = []
+        if sale is not None:
+            btc_sold, btc_remaining = sale
+            events.append(('sell', {
+                'date': bar.date,
+                'price': bar.high,
+                'all_time_high': self.state.all_time_high,
+                'btc_sold': btc_sold,
+                'dollars_received': btc_sold * bar.high,
+                'btc_remaining': btc_remaining
+            }))
+        if purchase is not None:
+            btc_purchased, total_btc = purchase
+            events.append(('buy', {
+                'date': bar.date,
+                'price': bar.low,
+                'all_time_high': self.state.all_time_high,
+                'btc_purchased': btc_purchased,
+                'dollars_spent': self.dollar_amount,
+                'total_btc_after_purchase': total_btc
+            }))
+        return events
+
+
+def btc_data_from_columns(columns: CandleColumns, projection: Optional[Collection[str]] = None) -> List[BTCData]:
+    if not columns.column_names():
+        return []
+    # Exports hold a single pair, so the symbol is shared by every row; unloaded columns and those
+    # outside a given projection stay None
+    values = []
+    for name in BTC_DATA_FIELDS:
+        if projection is not None and name not in projection:
+            values.append(repeat(None))
+        elif name == 'symbol':
+            values.append(repeat(columns.symbol))
+        elif getattr(columns, name) is None:
+            values.append(repeat(None))
+        else:
+            values.append(getattr(columns, name).tolist())
+    return [BTCData(*row) for row in islice(zip(*values), len(columns))]
+
+
+def load_btc_data(filename: str, use_cache: bool = True, dates_from_unix: bool = False,
+                  check_dates_against_unix: bool = False,
+                  columns: Optional[Collection[str]] = None) -> List[BTCData]:
+    if use_cache:
+        # Reuse the binary sidecar cache written by load_btc_columns instead of re-parsing the CSV. The
+        # symbol is always loaded, and a projection gets the same rows as iter_btc_data gives it
+        loaded = None if columns is None else [name for name in columns if name != 'symbol'] or ['unix_time']
+        return btc_data_from_columns(load_btc_columns(filename, loaded, dates_from_unix=dates_from_unix,
+                                                      check_dates_against_unix=check_dates_against_unix),
+                                     columns)
+
+    return list(iter_btc_data(filename, dates_from_unix, check_dates_against_unix, columns))
 
 
-def load_btc_data(filename: str) -> List[BTCData]:
-    data = []
-    with open(filename, 'r') as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            data.append(BTCData.from_csv_row(row))
-    return data
+def iter_btc_data(source: Union[str, TextIO], dates_from_unix: bool = False,
+                  check_dates_against_unix: bool = False,
+                  columns: Optional[Collection[str]] = None) -> Iterator[BTCData]:
+    # Yields rows as they are parsed; '-' reads from stdin so a decompressor can be piped in
+    if columns is not None:
+        unknown = set(columns) - set(BTC_DATA_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown BTCData fields: {', '.join(sorted(unknown))}")
+        csv_columns = {CSV_FIELDS[name][0] for name in columns if name != 'date'}
+        if 'date' in columns:
+            csv_columns |= {'unix', 'date'}
+
+    def parse(file: TextIO) -> Iterator[BTCData]:
+        if columns is None:
+            for row in csv.DictReader(file):
+                yield BTCData.from_csv_row(row, dates_from_unix, check_dates_against_unix)
+            return
+
+        # Only the projected CSV columns are picked out of each line
+        reader = csv.reader(file)
+        picks = [(name, index) for index, name in enumerate(next(reader, [])) if name in csv_columns]
+        for values in reader:
+            row = {name: values[index] for name, index in picks}
+            yield BTCData.from_csv_row(row, dates_from_unix, check_dates_against_unix, columns)
+
+    if source == '-':
+        source = sys.stdin
+    if not isinstance(source, str):
+        yield from parse(source)
+        return
+
+    with open(source, 'r', newline='') as file:
+        yield from parse(file)
 
 
 def main():
-    # Example usage
-    filename = "Poloniex_BTCUSDT_1h.csv"
+    # Example usage, pass '-' to stream candles from stdin
+    filename = sys.argv[1] if len(sys.argv) > 1 else "Poloniex_BTCUSDT_1h.csv"
     dip_fraction = 0.98  # Buy when price dips to this fraction of ATH
     profit_fraction = 1.01  # Sell when price exceeds ATH by this fraction
     dollar_amount = 1000  # Spend $amount on each dip
@@ -122,30 +287,33 @@ def main():
     print_transactions = False
 
     try:
-        data = load_btc_data(filename)
-        purchases, sales = analyze_dips_and_trade(data, dip_fraction, profit_fraction,
-                                                  dollar_amount, sell_fraction)
+        # Stdin is streamed in constant memory, files go through the binary cache
+        if filename == '-':
+            data = iter_btc_data(filename, dates_from_unix=True, columns=ANALYZE_COLUMNS)
+        else:
+            data = load_btc_columns(filename, ANALYZE_COLUMNS, dates_from_unix=True)
+        if print_transactions:
+            # Totals are gathered while simulating rather than re-walking the trade lists
+            stats = DipTradingStats()
+            purchases, sales = analyze_dips_and_trade(data, dip_fraction, profit_fraction,
+                                                      dollar_amount, sell_fraction, stats=stats)
+        else:
+            # Only the totals are printed, so skip building the trade lists
+            stats = summarize_dips_and_trade(data, dip_fraction, profit_fraction, dollar_amount, sell_fraction)
 
         # Print purchase results
-        total_btc_bought = sum(p['btc_purchased'] for p in purchases)
-        total_spent = sum(p['dollars_spent'] for p in purchases)
-
-        print(f"\nTotal purchases made: {len(purchases)}")
-        print(f"Total BTC bought: {total_btc_bought:.8f}")
-        print(f"Total USD spent: ${total_spent:,.2f}")
+        print(f"\nTotal purchases made: {stats.purchases_made}")
+        print(f"Total BTC bought: {stats.total_btc_bought:.8f}")
+        print(f"Total USD spent: ${stats.total_spent:,.2f}")
 
         # Print sale results
-        total_btc_sold = sum(s['btc_sold'] for s in sales)
-        total_received = sum(s['dollars_received'] for s in sales)
-
-        print(f"\nTotal sales made: {len(sales)}")
-        print(f"Total BTC sold: {total_btc_sold:.8f}")
-        print(f"Total USD received: ${total_received:,.2f}")
-        print(f"Net profit/loss: ${total_received - total_spent:,.2f}")
+        print(f"\nTotal sales made: {stats.sales_made}")
+        print(f"Total BTC sold: {stats.total_btc_sold:.8f}")
+        print(f"Total USD received: ${stats.total_received:,.2f}")
+        print(f"Net profit/loss: ${stats.net_profit_loss:,.2f}")
 
-        # Calculate remaining BTC holdings
-        final_btc_holdings = total_btc_bought - total_btc_sold
-        print(f"Remaining BTC holdings: {final_btc_holdings:.8f}")
+        # Remaining BTC holdings
+        print(f"Remaining BTC holdings: {stats.final_btc_holdings:.8f}")
 
         # Print detailed trading history
         if print_transactions:
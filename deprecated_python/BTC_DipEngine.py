@@ -0,0 +1,591 @@
+import json
+import math
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from BTC_CandleData import CandleColumns, unix_to_datetime, unix_to_datetime64
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Rows handed to Python per step, keeps memory-mapped stores streaming
+CHUNK_ROWS = 65536
+
+
+@dataclass
+class DipTraderState:
+    # Everything analyze_dips_and_trade carries from one bar to the next. Passing the state of a
+    # finished run together with only the bars after bars_processed (e.g. columns.slice(
+    # state.bars_processed)) continues it exactly as a full rerun with the same parameters would
+    all_time_high: float = 0.0
+    current_btc_holdings: float = 0.0
+    sell_target: float = 0.0
+    allow_purchase: bool = False
+    ready_to_sell: bool = False
+    sales_made: int = 0
+    bars_processed: int = 0
+
+    def save(self, filename: str):
+        with open(filename, 'w') as file:
+            json.dump(asdict(self), file)
+
+    @classmethod
+    def load(cls, filename: str) -> 'DipTraderState':
+        with open(filename, 'r') as file:
+            return cls(**json.load(file))
+
+
+def check_parameters(dip_fraction: float, profit_fraction: float, sell_fraction: float):
+    if not 0 < dip_fraction < 1:
+        raise ValueError("Dip fraction must be between 0 and 1")
+    if profit_fraction <= 1:
+        raise ValueError("Profit fraction must be greater than 1")
+    if not 0 < sell_fraction <= 1:
+        raise ValueError("Sell fraction must be between 0 and 1")
+
+
+def trade_date(columns: CandleColumns, index: int) -> Optional[datetime]:
+    # Dates are only decoded for the bars that actually trade
+    if columns.date is not None:
+        return columns.date[index].item()
+    if columns.unix_time is not None:
+        return unix_to_datetime(int(columns.unix_time[index]))
+    return None
+
+
+@dataclass
+class DipTradingStats:
+    # The totals main reports, accumulated in scalars while simulating
+    purchases_made: int = 0
+    sales_made: int = 0
+    total_btc_bought: float = 0.0
+    total_spent: float = 0.0
+    total_btc_sold: float = 0.0
+    total_received: float = 0.0
+
+    @property
+    def net_profit_loss(self) -> float:
+        return self.total_received - self.total_spent
+
+    @property
+    def final_btc_holdings(self) -> float:
+        return self.total_btc_bought - self.total_btc_sold
+
+    def add(self, other: 'DipTradingStats'):
+        # Adds the totals of another run, e.g. one continued from where this one stopped
+        self.purchases_made += other.purchases_made
+        self.sales_made += other.sales_made
+        self.total_btc_bought += other.total_btc_bought
+        self.total_spent += other.total_spent
+        self.total_btc_sold += other.total_btc_sold
+        self.total_received += other.total_received
+
+    @classmethod
+    def from_trades(cls, purchases: List[dict], sales: List[dict]) -> 'DipTradingStats':
+        return cls(purchases_made=len(purchases),
+                   sales_made=len(sales),
+                   total_btc_bought=sum(p['btc_purchased'] for p in purchases),
+                   total_spent=sum(p['dollars_spent'] for p in purchases),
+                   total_btc_sold=sum(s['btc_sold'] for s in sales),
+                   total_received=sum(s['dollars_received'] for s in sales))
+
+
+# Columnar trade log, one record per trade: the bar index, the trade price, the all-time high at
+# the time, BTC bought or sold, dollars spent or received, the BTC held after the trade, and the
+# running totals of BTC and dollars over this log up to and including the trade
+TRADE_LOG_DTYPE = np.dtype([
+    ('index', np.int64),
+    ('price', np.float64),
+    ('all_time_high', np.float64),
+    ('btc', np.float64),
+    ('dollars', np.float64),
+    ('btc_holdings', np.float64),
+    ('cumulative_btc', np.float64),
+    ('cumulative_dollars', np.float64),
+])
+
+# on_sale(index, price, all_time_high, btc_sold, dollars_received, btc_remaining, total_btc_sold,
+# total_received) and on_purchase(index, price, all_time_high, btc_purchased, dollars_spent,
+# total_btc_after_purchase, total_btc_bought, total_spent), the totals include the trade itself
+TradeCallback = Callable[[int, float, float, float, float, float, float, float], None]
+
+
+def _simulate_events(columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                     dollar_amount: float, sell_fraction: float, state: Optional[DipTraderState],
+                     on_sale: Optional[TradeCallback] = None, on_purchase: Optional[TradeCallback] = None,
+                     stats: Optional[DipTradingStats] = None) -> DipTradingStats:
+    # Only visits bars where the state can change: a new all-time high, a high reaching the sell
+    # target, or a low reaching the dip target, found with the dataset's range index. Between
+    # those every bar is a no-op, so the runtime follows the number of trades and new highs
+    check_parameters(dip_fraction, profit_fraction, sell_fraction)
+
+    # Totals are added to the given stats, the running sale count sizes purchases
+    start = state or DipTraderState()
+    stats = stats if stats is not None else DipTradingStats()
+    sales_made = start.sales_made
+    all_time_high = start.all_time_high
+    current_btc_holdings = start.current_btc_holdings
+    sell_target = start.sell_target
+    allow_purchase = start.allow_purchase
+    ready_to_sell = start.ready_to_sell
+    highs = columns.high
+    lows = columns.low
+    range_index = columns.range_index
+    running_highs = columns.all_time_high
+    new_high_indices = columns.new_high_indices
+    bar_count = len(columns)
+
+    index = 0
+    while index < bar_count:
+        # Until the next new high the all-time high, and with it the dip target, stays fixed
+        position = np.searchsorted(new_high_indices, index)
+        next_index = int(new_high_indices[position]) if position < len(new_high_indices) else bar_count
+        if ready_to_sell and current_btc_holdings > 0:
+            found = range_index.first_high_at_or_above(sell_target, index, next_index)
+            next_index = next_index if found is None else found
+        if allow_purchase:
+            found = range_index.first_low_at_or_below(all_time_high * dip_fraction, index, next_index)
+            next_index = next_index if found is None else found
+        if next_index >= bar_count:
+            break
+        index = next_index
+        high = float(highs[index])
+        low = float(lows[index])
+
+        if running_highs[index] > all_time_high:
+            all_time_high = float(running_highs[index])
+            allow_purchase = True
+
+        # Check for selling conditions first
+        if ready_to_sell and current_btc_holdings > 0 and high >= sell_target:
+            btc_to_sell = current_btc_holdings * sell_fraction
+            dollars_received = btc_to_sell * high
+            sales_made += 1
+            stats.sales_made += 1
+            stats.total_btc_sold += btc_to_sell
+            stats.total_received += dollars_received
+            if on_sale is not None:
+                on_sale(index, high, all_time_high, btc_to_sell, dollars_received,
+                        current_btc_holdings - btc_to_sell, stats.total_btc_sold, stats.total_received)
+            current_btc_holdings -= btc_to_sell
+            ready_to_sell = False
+            allow_purchase = True
+
+        # Check for buying conditions
+        if allow_purchase and low <= all_time_high * dip_fraction:
+            purchase_amount = dollar_amount * math.log2(sales_made + 2)
+            btc_amount = purchase_amount / low
+            stats.purchases_made += 1
+            stats.total_btc_bought += btc_amount
+            stats.total_spent += dollar_amount
+            if on_purchase is not None:
+                on_purchase(index, low, all_time_high, btc_amount, dollar_amount,
+                            current_btc_holdings + btc_amount, stats.total_btc_bought, stats.total_spent)
+            current_btc_holdings += btc_amount
+            allow_purchase = False
+            ready_to_sell = True
+            sell_target = all_time_high * profit_fraction
+        index += 1
+
+    if state is not None:
+        state.all_time_high = all_time_high
+        state.current_btc_holdings = current_btc_holdings
+        state.sell_target = sell_target
+        state.allow_purchase = allow_purchase
+        state.ready_to_sell = ready_to_sell
+        state.sales_made = sales_made
+        state.bars_processed += bar_count
+    return stats
+
+
+def analyze_dip_events(columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                       dollar_amount: float, sell_fraction: float, state: Optional[DipTraderState] = None,
+                       stats: Optional[DipTradingStats] = None) -> Tuple[List[dict], List[dict]]:
+    # Same results as analyze_dips_and_trade over rows, visiting only the bars that can trade. The
+    # range index this needs is O(n) in memory, so memory-mapped stores stream through the kernel
+    # instead. A given stats gets the totals added
+    if columns.memory_mapped:
+        result = simulate_dip_kernel(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state)
+        if stats is not None:
+            stats.add(result.stats)
+        return trade_dicts(columns, result)
+
+    purchases = []
+    sales = []
+
+    def on_sale(index, price, all_time_high, btc_sold, dollars_received, btc_remaining, *totals):
+        sales.append({
+            'date': trade_date(columns, index),
+            'price': price,
+            'all_time_high': all_time_high,
+            'btc_sold': btc_sold,
+            'dollars_received': dollars_received,
+            'btc_remaining': btc_remaining
+        })
+
+    def on_purchase(index, price, all_time_high, btc_purchased, dollars_spent, total_btc_after_purchase, *totals):
+        purchases.append({
+            'date': trade_date(columns, index),
+            'price': price,
+            'all_time_high': all_time_high,
+            'btc_purchased': btc_purchased,
+            'dollars_spent': dollars_spent,
+            'total_btc_after_purchase': total_btc_after_purchase
+        })
+
+    _simulate_events(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state,
+                     on_sale, on_purchase, stats)
+    return purchases, sales
+
+
+@dataclass
+class DipTradingResult:
+    # Totals kept while simulating plus TRADE_LOG_DTYPE logs whose cumulative columns give the
+    # totals after any trade, so reporting never has to walk the trades again
+    stats: DipTradingStats
+    purchases: np.ndarray
+    sales: np.ndarray
+
+
+def simulate_dips(columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                  dollar_amount: float, sell_fraction: float,
+                  state: Optional[DipTraderState] = None) -> DipTradingResult:
+    # The kernel when compiled, and for memory-mapped stores since it streams them in chunks
+    if JIT_AVAILABLE or columns.memory_mapped:
+        return simulate_dip_kernel(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state)
+    purchases = []
+    sales = []
+    stats = _simulate_events(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state,
+                             lambda *trade: sales.append(trade), lambda *trade: purchases.append(trade))
+    return DipTradingResult(stats, np.array(purchases, dtype=TRADE_LOG_DTYPE),
+                            np.array(sales, dtype=TRADE_LOG_DTYPE))
+
+
+def dip_trade_logs(columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                   dollar_amount: float, sell_fraction: float,
+                   state: Optional[DipTraderState] = None) -> Tuple[np.ndarray, np.ndarray]:
+    # The purchases and sales of analyze_dip_events as TRADE_LOG_DTYPE arrays, ready to be summed,
+    # filtered or exported without Python loops; trade_dates gives their dates
+    result = simulate_dips(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state)
+    return result.purchases, result.sales
+
+
+def _trade_dicts(columns: CandleColumns, trade_log: np.ndarray, btc: str, dollars: str,
+                 btc_holdings: str) -> List[dict]:
+    # The dicts analyze_dips_and_trade builds, from a TRADE_LOG_DTYPE log
+    logged = zip(*(trade_log[name].tolist() for name in
+                   ('index', 'price', 'all_time_high', 'btc', 'dollars', 'btc_holdings')))
+    return [{
+        'date': trade_date(columns, index),
+        'price': price,
+        'all_time_high': all_time_high,
+        btc: btc_traded,
+        dollars: dollars_traded,
+        btc_holdings: holdings
+    } for index, price, all_time_high, btc_traded, dollars_traded, holdings in logged]
+
+
+def trade_dicts(columns: CandleColumns, result: DipTradingResult) -> Tuple[List[dict], List[dict]]:
+    # The purchases and sales of a simulate_dips result over columns, as analyze_dips_and_trade returns them
+    return (_trade_dicts(columns, result.purchases, 'btc_purchased', 'dollars_spent', 'total_btc_after_purchase'),
+            _trade_dicts(columns, result.sales, 'btc_sold', 'dollars_received', 'btc_remaining'))
+
+
+def trade_dates(columns: CandleColumns, trade_log: np.ndarray) -> np.ndarray:
+    if columns.date is not None:
+        return columns.date[trade_log['index']]
+    return unix_to_datetime64(columns.unix_time[trade_log['index']])
+
+
+def dip_trading_stats(columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                      dollar_amount: float, sell_fraction: float,
+                      state: Optional[DipTraderState] = None) -> DipTradingStats:
+    # Totals only, no per-trade dicts or dates are built, for sweeps that discard the trade logs
+    if JIT_AVAILABLE or columns.memory_mapped:
+        return simulate_dip_kernel(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction,
+                                   state, keep_logs=False).stats
+    return _simulate_events(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction, state)
+
+
+# True when Numba compiled the dip kernel, simulate_dips and dip_trading_stats then run it instead
+# of the Python event loop. Cleared below if Numba imports but fails to compile it
+JIT_AVAILABLE = njit is not None
+
+
+def _log_trade(log, row, index, price, all_time_high, btc, dollars, btc_holdings, cumulative_btc,
+               cumulative_dollars):
+    # Writes one TRADE_LOG_DTYPE record as a row of floats, field by field
+    log[row, 0] = index
+    log[row, 1] = price
+    log[row, 2] = all_time_high
+    log[row, 3] = btc
+    log[row, 4] = dollars
+    log[row, 5] = btc_holdings
+    log[row, 6] = cumulative_btc
+    log[row, 7] = cumulative_dollars
+
+
+def _dip_kernel(high, low, running_highs, offset, dip_fraction, profit_fraction, dollar_amount, sell_fraction,
+                multipliers, all_time_high, current_btc_holdings, sell_target, allow_purchase, ready_to_sell,
+                sales_made, totals, purchase_log, sale_log, keep_logs):
+    # The analyze_dips_and_trade rules over one chunk in scalar code Numba can compile. multipliers[n] sizes the
+    # purchase after n sales in all, running_highs a running maximum of high from the chunk or an
+    # earlier bar on (it only exceeds the carried all-time high on bars setting a new one), and totals
+    # (BTC bought, spent, BTC sold, received) is updated in place. Without keep_logs the logs may be
+    # empty and nothing is written to them. Returns the carried state and how many trades each side made
+    purchase_count = 0
+    sale_count = 0
+    for bar in range(len(high)):
+        if running_highs[bar] > all_time_high:
+            all_time_high = running_highs[bar]
+            allow_purchase = True
+
+        if ready_to_sell and current_btc_holdings > 0 and high[bar] >= sell_target:
+            btc_to_sell = current_btc_holdings * sell_fraction
+            dollars_received = btc_to_sell * high[bar]
+            current_btc_holdings -= btc_to_sell
+            totals[2] += btc_to_sell
+            totals[3] += dollars_received
+            if keep_logs:
+                _log_trade(sale_log, sale_count, offset + bar, high[bar], all_time_high, btc_to_sell,
+                           dollars_received, current_btc_holdings, totals[2], totals[3])
+            sale_count += 1
+            sales_made += 1
+            ready_to_sell = False
+            allow_purchase = True
+
+        if allow_purchase and low[bar] <= all_time_high * dip_fraction:
+            btc_amount = dollar_amount * multipliers[sales_made] / low[bar]
+            current_btc_holdings += btc_amount
+            totals[0] += btc_amount
+            totals[1] += dollar_amount
+            if keep_logs:
+                _log_trade(purchase_log, purchase_count, offset + bar, low[bar], all_time_high, btc_amount,
+                           dollar_amount, current_btc_holdings, totals[0], totals[1])
+            purchase_count += 1
+            allow_purchase = False
+            ready_to_sell = True
+            sell_target = all_time_high * profit_fraction
+
+    return (all_time_high, current_btc_holdings, sell_target, allow_purchase, ready_to_sell, sales_made,
+            purchase_count, sale_count)
+
+
+def _compile_dip_kernel():
+    # One bar through the kernel with logging on, so Numba compiles both functions at import
+    bars = np.ones(1)
+    log = np.empty((1, len(TRADE_LOG_DTYPE)))
+    _dip_kernel(bars, bars, bars, 0, 0.5, 1.5, 1.0, 0.5, np.ones(2), 0.0, 0.0, 0.0, False, False, 0,
+                np.zeros(4), log, np.empty_like(log), True)
+
+
+if JIT_AVAILABLE:
+    _python_kernel = (_log_trade, _dip_kernel)
+    _log_trade = njit(cache=True)(_log_trade)
+    _dip_kernel = njit(cache=True)(_dip_kernel)
+    try:
+        _compile_dip_kernel()
+    except Exception:
+        # e.g. a Numba release that doesn't support the installed NumPy, the Python kernel stays exact
+        _log_trade, _dip_kernel = _python_kernel
+        JIT_AVAILABLE = False
+
+
+def _trade_log(rows: np.ndarray) -> np.ndarray:
+    log = np.empty(len(rows), dtype=TRADE_LOG_DTYPE)
+    for column, name in enumerate(TRADE_LOG_DTYPE.names):
+        log[name] = rows[:, column]
+    return log
+
+
+def simulate_dip_kernel(columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                        dollar_amount: float, sell_fraction: float,
+                        state: Optional[DipTraderState] = None, keep_logs: bool = True) -> DipTradingResult:
+    # simulate_dips through _dip_kernel, one chunk at a time. Without Numba the same kernel runs as
+    # plain Python, exact but slower than the event loop. Apart from the trade logs its memory is
+    # bounded by the chunk size, so memory-mapped stores larger than RAM run through it. Without
+    # keep_logs only the stats are kept and the result's logs are empty
+    check_parameters(dip_fraction, profit_fraction, sell_fraction)
+
+    start = state or DipTraderState()
+    carried = (start.all_time_high, start.current_btc_holdings, start.sell_target, start.allow_purchase,
+               start.ready_to_sell, start.sales_made)
+    totals = np.zeros(4)
+    purchases_made = 0
+    sales_made = 0
+    no_log = np.empty((0, len(TRADE_LOG_DTYPE)))
+    purchases = [no_log]
+    sales = [np.empty((0, len(TRADE_LOG_DTYPE)))]
+    # In memory the dataset's running maximum is computed once and shared by every run, memory-mapped
+    # stores take it per chunk rather than hold a per-bar array
+    memory_mapped = columns.memory_mapped
+    running_highs = None if memory_mapped else columns.all_time_high
+
+    for offset in range(0, len(columns), CHUNK_ROWS):
+        stop = offset + CHUNK_ROWS
+        highs = columns.high[offset:stop]
+        chunk_highs = np.maximum.accumulate(highs) if memory_mapped else running_highs[offset:stop]
+        bars = [np.asarray(values) if JIT_AVAILABLE else values.tolist()
+                for values in (highs, columns.low[offset:stop], chunk_highs)]
+        # A chunk makes at most one sale per bar, the table is sized in powers of two so runs share it
+        multipliers = _purchase_multipliers(1 << (int(carried[-1]) + len(highs) + 1).bit_length())
+        purchase_log = np.empty((len(bars[0]), len(TRADE_LOG_DTYPE))) if keep_logs else no_log
+        sale_log = np.empty_like(purchase_log)
+        *carried, purchase_count, sale_count = _dip_kernel(
+            *bars, offset, dip_fraction, profit_fraction, dollar_amount, sell_fraction, multipliers,
+            *carried, totals, purchase_log, sale_log, keep_logs)
+        purchases_made += purchase_count
+        sales_made += sale_count
+        purchases.append(purchase_log[:purchase_count])
+        sales.append(sale_log[:sale_count])
+
+    purchases = _trade_log(np.concatenate(purchases))
+    sales = _trade_log(np.concatenate(sales))
+    all_time_high, current_btc_holdings, sell_target, allow_purchase, ready_to_sell, total_sales = carried
+    if state is not None:
+        state.all_time_high = float(all_time_high)
+        state.current_btc_holdings = float(current_btc_holdings)
+        state.sell_target = float(sell_target)
+        state.allow_purchase = bool(allow_purchase)
+        state.ready_to_sell = bool(ready_to_sell)
+        state.sales_made = int(total_sales)
+        state.bars_processed += len(columns)
+    stats = DipTradingStats(purchases_made, sales_made, float(totals[0]), float(totals[1]),
+                            float(totals[2]), float(totals[3]))
+    return DipTradingResult(stats, purchases, sales)
+
+
+@dataclass
+class BatchStats:
+    # Totals of simulate_parameter_batch, element i belongs to the i-th parameter set
+    dip_fraction: np.ndarray
+    profit_fraction: np.ndarray
+    dollar_amount: np.ndarray
+    sell_fraction: np.ndarray
+    purchases_made: np.ndarray
+    sales_made: np.ndarray
+    total_btc_bought: np.ndarray
+    total_spent: np.ndarray
+    total_btc_sold: np.ndarray
+    total_received: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dip_fraction)
+
+    def __getitem__(self, index: int) -> DipTradingStats:
+        return DipTradingStats(int(self.purchases_made[index]), int(self.sales_made[index]),
+                               float(self.total_btc_bought[index]), float(self.total_spent[index]),
+                               float(self.total_btc_sold[index]), float(self.total_received[index]))
+
+    @property
+    def net_profit_loss(self) -> np.ndarray:
+        return self.total_received - self.total_spent
+
+    @property
+    def final_btc_holdings(self) -> np.ndarray:
+        return self.total_btc_bought - self.total_btc_sold
+
+
+@lru_cache(maxsize=8)
+def _purchase_multipliers(count: int) -> np.ndarray:
+    # log2(sales + 2) for every sale count below count, through math.log2 so the batch and the
+    # kernel size purchases bit for bit like the scalar engines. Cached read-only, runs over the
+    # same dataset ask for the same table
+    multipliers = np.array([math.log2(sales + 2) for sales in range(count)], dtype=np.float64)
+    multipliers.flags.writeable = False
+    return multipliers
+
+
+def simulate_parameter_batch(columns: CandleColumns, dip_fraction, profit_fraction, dollar_amount,
+                             sell_fraction) -> BatchStats:
+    # Runs every parameter set (the arguments broadcast against each other, e.g. from a meshgrid)
+    # in one pass over the data, holding their states as arrays. Like analyze_dip_events it only
+    # visits bars where at least one set can change state, and it matches its totals exactly
+    dip_fraction, profit_fraction, dollar_amount, sell_fraction = (
+        np.ravel(values).astype(np.float64) for values in
+        np.broadcast_arrays(dip_fraction, profit_fraction, dollar_amount, sell_fraction))
+    if not np.all((dip_fraction > 0) & (dip_fraction < 1)):
+        raise ValueError("Dip fraction must be between 0 and 1")
+    if not np.all(profit_fraction > 1):
+        raise ValueError("Profit fraction must be greater than 1")
+    if not np.all((sell_fraction > 0) & (sell_fraction <= 1)):
+        raise ValueError("Sell fraction must be between 0 and 1")
+
+    set_count = len(dip_fraction)
+    current_btc_holdings = np.zeros(set_count)
+    sell_target = np.zeros(set_count)
+    allow_purchase = np.zeros(set_count, dtype=bool)
+    ready_to_sell = np.zeros(set_count, dtype=bool)
+    purchases_made = np.zeros(set_count, dtype=np.int64)
+    sales_made = np.zeros(set_count, dtype=np.int64)
+    total_btc_bought = np.zeros(set_count)
+    total_spent = np.zeros(set_count)
+    total_btc_sold = np.zeros(set_count)
+    total_received = np.zeros(set_count)
+    multipliers = _purchase_multipliers(64)
+
+    # The all-time high doesn't depend on the parameters, so it is shared by every set
+    all_time_high = 0.0
+    highs = columns.high
+    lows = columns.low
+    range_index = columns.range_index
+    running_highs = columns.all_time_high
+    new_high_indices = columns.new_high_indices
+    bar_count = len(columns)
+
+    index = 0
+    while index < bar_count and set_count:
+        position = np.searchsorted(new_high_indices, index)
+        next_index = int(new_high_indices[position]) if position < len(new_high_indices) else bar_count
+        selling = ready_to_sell & (current_btc_holdings > 0)
+        if selling.any():
+            found = range_index.first_high_at_or_above(sell_target[selling].min(), index, next_index)
+            next_index = next_index if found is None else found
+        if allow_purchase.any():
+            found = range_index.first_low_at_or_below((all_time_high * dip_fraction[allow_purchase]).max(),
+                                                      index, next_index)
+            next_index = next_index if found is None else found
+        if next_index >= bar_count:
+            break
+        index = next_index
+        high = float(highs[index])
+        low = float(lows[index])
+
+        if running_highs[index] > all_time_high:
+            all_time_high = float(running_highs[index])
+            allow_purchase[:] = True
+
+        # Check for selling conditions first
+        sells = ready_to_sell & (current_btc_holdings > 0) & (high >= sell_target)
+        if sells.any():
+            btc_to_sell = current_btc_holdings[sells] * sell_fraction[sells]
+            total_btc_sold[sells] += btc_to_sell
+            total_received[sells] += btc_to_sell * high
+            current_btc_holdings[sells] -= btc_to_sell
+            sales_made[sells] += 1
+            ready_to_sell[sells] = False
+            allow_purchase[sells] = True
+
+        # Check for buying conditions
+        buys = allow_purchase & (low <= all_time_high * dip_fraction)
+        if buys.any():
+            if sales_made.max() >= len(multipliers):
+                multipliers = _purchase_multipliers(2 * len(multipliers))
+            btc_amount = dollar_amount[buys] * multipliers[sales_made[buys]] / low
+            total_btc_bought[buys] += btc_amount
+            total_spent[buys] += dollar_amount[buys]
+            current_btc_holdings[buys] += btc_amount
+            purchases_made[buys] += 1
+            allow_purchase[buys] = False
+            ready_to_sell[buys] = True
+            sell_target[buys] = all_time_high * profit_fraction[buys]
+        index += 1
+
+    return BatchStats(dip_fraction, profit_fraction, dollar_amount, sell_fraction, purchases_made, sales_made,
+                      total_btc_bought, total_spent, total_btc_sold, total_received)
@@ -0,0 +1,162 @@
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from BTC_CandleData import CandleColumns, load_btc_columns
+from BTC_DipAnalysis import ANALYZE_COLUMNS, summarize_dips_and_trade
+
+# (dip_fraction, profit_fraction, dollar_amount, sell_fraction), in analyze_dips_and_trade order
+Parameters = Tuple[float, float, float, float]
+
+
+@dataclass
+class OptimizationResult:
+    dip_fraction: float
+    profit_fraction: float
+    sell_fraction: float
+    dollar_amount: float
+    net_profit_loss: float
+    iterations: int
+
+
+def clamp(value: float, minimum: float, maximum: float) -> float:
+    return min(max(value, minimum), maximum)
+
+
+def net_profit_loss(data: CandleColumns, parameters: Parameters) -> float:
+    # calculateProfitForParams, parameters the trader rejects score -inf
+    try:
+        return summarize_dips_and_trade(data, *parameters).net_profit_loss
+    except ValueError:
+        return -math.inf
+
+
+# The candles of a pool worker, handed over once when the worker starts
+_worker_data: Optional[CandleColumns] = None
+
+
+def _init_worker(data: CandleColumns):
+    global _worker_data
+    _worker_data = data
+
+
+def _worker_net_profit_loss(parameters: Parameters) -> float:
+    return net_profit_loss(_worker_data, parameters)
+
+
+def _probes(dip_fraction: float, profit_fraction: float, dollar_amount: float, sell_fraction: float,
+            epsilon: float) -> List[Parameters]:
+    # The finite-difference points around the current parameters, clamped like the TypeScript optimizer.
+    # Dip probes stay inside the range the parameters are clamped to, as the trader rejects 1 and above
+    return [
+        (min(0.999, dip_fraction + epsilon), profit_fraction, dollar_amount, sell_fraction),
+        (max(0.001, dip_fraction - epsilon), profit_fraction, dollar_amount, sell_fraction),
+        (dip_fraction, profit_fraction + epsilon, dollar_amount, sell_fraction),
+        (dip_fraction, max(1.0001, profit_fraction - epsilon), dollar_amount, sell_fraction),
+        (dip_fraction, profit_fraction, dollar_amount, min(1, sell_fraction + epsilon)),
+        (dip_fraction, profit_fraction, dollar_amount, max(0.0001, sell_fraction - epsilon)),
+    ]
+
+
+def optimize_parameters(data: CandleColumns, learning_rate: float, max_iterations: int,
+                        convergence_threshold: float, dip_fraction: float = 0.97, profit_fraction: float = 1.05,
+                        sell_fraction: float = 0.25, dollar_amount: float = 1000, epsilon: float = 0.01,
+                        workers: int = 1) -> OptimizationResult:
+    # Normalized gradient ascent on net profit/loss, as BTCParameterOptimization.ts. Every iteration
+    # scores the current parameters and its six probes as one batch, spread over a process pool
+    # whose workers receive the candles once when workers > 1
+    if not learning_rate or not max_iterations or not convergence_threshold:
+        raise ValueError("Learning rate, max iterations, and convergence threshold must be specified")
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,))
+
+    def evaluate(batch: List[Parameters]) -> List[float]:
+        if executor is None:
+            return [net_profit_loss(data, parameters) for parameters in batch]
+        return list(executor.map(_worker_net_profit_loss, batch))
+
+    best = (dip_fraction, profit_fraction, sell_fraction)
+    best_profit = -math.inf
+    previous_profit = 0.0
+    iteration = 0
+    progress_every = max_iterations // 10
+
+    try:
+        while iteration < max_iterations:
+            current_profit, dip_up, dip_down, profit_up, profit_down, sell_up, sell_down = evaluate(
+                [(dip_fraction, profit_fraction, dollar_amount, sell_fraction)] +
+                _probes(dip_fraction, profit_fraction, dollar_amount, sell_fraction, epsilon))
+
+            # Update the best parameters if we found better profit
+            if current_profit > best_profit:
+                best_profit = current_profit
+                best = (dip_fraction, profit_fraction, sell_fraction)
+
+            # Check for convergence
+            if abs(current_profit - previous_profit) < convergence_threshold:
+                break
+
+            gradients = ((dip_up - dip_down) / (2 * epsilon),
+                         (profit_up - profit_down) / (2 * epsilon),
+                         (sell_up - sell_down) / (2 * epsilon))
+            # A probe the trader still rejects scores -inf, its direction is skipped rather than
+            # turning the step, and with it every parameter, into NaN
+            gradients = tuple(gradient if math.isfinite(gradient) else 0.0 for gradient in gradients)
+            gradient_norm = math.sqrt(sum(gradient * gradient for gradient in gradients))
+            if gradient_norm > 1e-8:
+                gradients = tuple(gradient / gradient_norm for gradient in gradients)
+
+            dip_fraction = clamp(dip_fraction + learning_rate * gradients[0], 0.001, 0.999)
+            profit_fraction = clamp(profit_fraction + learning_rate * gradients[1], 1.001, 2.0)
+            sell_fraction = clamp(sell_fraction + learning_rate * gradients[2], 0.0001, 1.0)
+
+            previous_profit = current_profit
+            iteration += 1
+
+            if progress_every and iteration % progress_every == 0:
+                print(f"Iteration {iteration}: Profit = {current_profit}")
+                print(f"Parameters: dip {dip_fraction}, profit {profit_fraction}, sell {sell_fraction}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return OptimizationResult(best[0], best[1], best[2], dollar_amount, best_profit, iteration)
+
+
+def main():
+    filename = sys.argv[1] if len(sys.argv) > 1 else "Poloniex_BTCUSDT_1h.csv"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    try:
+        data = load_btc_columns(filename, ANALYZE_COLUMNS, dates_from_unix=True)
+
+        print("Starting parameter optimization...")
+        optimized = optimize_parameters(data, learning_rate=0.0001, max_iterations=10000,
+                                        convergence_threshold=0.001, workers=workers)
+
+        print("\nOptimization Results:")
+        print(f"Best Dip Fraction: {optimized.dip_fraction:.4f}")
+        print(f"Best Profit Fraction: {optimized.profit_fraction:.4f}")
+        print(f"Best Sell Fraction: {optimized.sell_fraction:.4f}")
+        print(f"Net Profit/Loss: ${optimized.net_profit_loss:,.2f}")
+        print(f"Iterations: {optimized.iterations}")
+
+        # Run final simulation with optimized parameters
+        stats = summarize_dips_and_trade(data, optimized.dip_fraction, optimized.profit_fraction,
+                                         optimized.dollar_amount, optimized.sell_fraction)
+        print("\nFinal Trading Statistics:")
+        print(f"Total Trades: {stats.purchases_made} buys, {stats.sales_made} sells")
+        print(f"Final Net Profit/Loss: ${stats.net_profit_loss:,.2f}")
+
+    except FileNotFoundError:
+        print(f"Error: Could not find file {filename}")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
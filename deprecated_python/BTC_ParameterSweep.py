@@ -0,0 +1,375 @@
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from BTC_CandleData import CandleColumns, load_btc_columns, resample_columns
+from BTC_DipEngine import BatchStats, simulate_parameter_batch
+
+# The columns a sweep reads, the only ones copied into shared memory
+SWEEP_COLUMNS = ('high', 'low')
+
+# Parameter sets per task, big enough for the batch engine to amortize its pass over the bars
+SWEEP_CHUNK = 4096
+
+
+def parameter_grid(dip_fractions: Sequence[float], profit_fractions: Sequence[float],
+                   sell_fractions: Sequence[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Every dip x profit x sell combination as flat arrays, dip varying slowest
+    dip_fraction, profit_fraction, sell_fraction = np.meshgrid(
+        np.asarray(dip_fractions, dtype=np.float64), np.asarray(profit_fractions, dtype=np.float64),
+        np.asarray(sell_fractions, dtype=np.float64), indexing='ij')
+    return dip_fraction.ravel(), profit_fraction.ravel(), sell_fraction.ravel()
+
+
+def _share_columns(columns: CandleColumns) -> shared_memory.SharedMemory:
+    # One block holding SWEEP_COLUMNS back to back as float64
+    bar_count = len(columns)
+    memory = shared_memory.SharedMemory(create=True, size=max(len(SWEEP_COLUMNS) * bar_count * 8, 1))
+    for position, name in enumerate(SWEEP_COLUMNS):
+        np.ndarray(bar_count, np.float64, memory.buf, position * bar_count * 8)[:] = getattr(columns, name)
+    return memory
+
+
+# A worker's view of the shared candles, attached once when the worker starts. The block is kept
+# referenced for as long as the views over it live
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+_worker_columns: Optional[CandleColumns] = None
+
+
+def _attach_columns(memory_name: str, bar_count: int):
+    global _worker_memory, _worker_columns
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_columns = CandleColumns(**{
+        name: np.ndarray(bar_count, np.float64, _worker_memory.buf, position * bar_count * 8)
+        for position, name in enumerate(SWEEP_COLUMNS)})
+
+
+def _worker_batch(dip_fraction: np.ndarray, profit_fraction: np.ndarray, dollar_amount: float,
+                  sell_fraction: np.ndarray) -> BatchStats:
+    return simulate_parameter_batch(_worker_columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction)
+
+
+def sweep_parameters(columns: CandleColumns, dip_fraction: np.ndarray, profit_fraction: np.ndarray,
+                     sell_fraction: np.ndarray, dollar_amount: float = 1000, workers: int = 1,
+                     chunk_size: int = SWEEP_CHUNK) -> Iterator[BatchStats]:
+    # Runs the i-th dip/profit/sell sets (e.g. from parameter_grid) in chunks of chunk_size through
+    # simulate_parameter_batch and yields each chunk's totals in order as soon as it is done.
+    # With workers > 1 the highs and lows are copied once into shared memory that every worker
+    # maps, so tasks only carry parameters and totals
+    dip_fraction, profit_fraction, sell_fraction = (
+        np.ravel(values).astype(np.float64) for values in
+        np.broadcast_arrays(dip_fraction, profit_fraction, sell_fraction))
+    chunks = [(dip_fraction[start:start + chunk_size], profit_fraction[start:start + chunk_size],
+               sell_fraction[start:start + chunk_size]) for start in range(0, len(dip_fraction), chunk_size)]
+
+    if workers <= 1 or len(chunks) < 2:
+        for dip, profit, sell in chunks:
+            yield simulate_parameter_batch(columns, dip, profit, dollar_amount, sell)
+        return
+
+    memory = _share_columns(columns)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_columns,
+                                 initargs=(memory.name, len(columns))) as executor:
+            futures = [executor.submit(_worker_batch, dip, profit, dollar_amount, sell) for dip, profit, sell in chunks]
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                # A consumer that stops early doesn't wait for the rest of the grid
+                for future in futures:
+                    future.cancel()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+# The totals of a BatchStats as stored, the parameters come first and form the key
+RESULT_FIELDS = tuple(field.name for field in fields(BatchStats))
+
+
+class SweepStore:
+    # Sweep results in SQLite, one row per dataset fingerprint and parameter set, so an
+    # interrupted sweep resumes where it stopped and finished ones can be queried for free
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sweep_results (
+                fingerprint TEXT NOT NULL,
+                dip_fraction REAL NOT NULL,
+                profit_fraction REAL NOT NULL,
+                dollar_amount REAL NOT NULL,
+                sell_fraction REAL NOT NULL,
+                purchases_made INTEGER NOT NULL,
+                sales_made INTEGER NOT NULL,
+                total_btc_bought REAL NOT NULL,
+                total_spent REAL NOT NULL,
+                total_btc_sold REAL NOT NULL,
+                total_received REAL NOT NULL,
+                net_profit_loss REAL NOT NULL,
+                PRIMARY KEY (fingerprint, dip_fraction, profit_fraction, dollar_amount, sell_fraction)
+            );
+            CREATE INDEX IF NOT EXISTS sweep_results_by_profit ON sweep_results (fingerprint, net_profit_loss);
+        """)
+
+    def __enter__(self) -> 'SweepStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, fingerprint: str, batch: BatchStats):
+        rows = zip(*(getattr(batch, name).tolist() for name in RESULT_FIELDS), batch.net_profit_loss.tolist())
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO sweep_results (fingerprint, {', '.join(RESULT_FIELDS)}, net_profit_loss) "
+                f"VALUES (?, {', '.join('?' * len(RESULT_FIELDS))}, ?)",
+                ((fingerprint, *row) for row in rows))
+
+    def evaluated(self, fingerprint: str, dollar_amount: float) -> set:
+        # (dip_fraction, profit_fraction, sell_fraction) of every stored set
+        return set(self.connection.execute(
+            "SELECT dip_fraction, profit_fraction, sell_fraction FROM sweep_results "
+            "WHERE fingerprint = ? AND dollar_amount = ?", (fingerprint, float(dollar_amount))))
+
+    def best(self, fingerprint: str, limit: int = 10, dollar_amount: Optional[float] = None) -> BatchStats:
+        # The stored sets with the highest net profit/loss, best first
+        query = f"SELECT {', '.join(RESULT_FIELDS)} FROM sweep_results WHERE fingerprint = ?"
+        arguments = [fingerprint]
+        if dollar_amount is not None:
+            query += " AND dollar_amount = ?"
+            arguments.append(float(dollar_amount))
+        query += " ORDER BY net_profit_loss DESC, dip_fraction, profit_fraction, sell_fraction LIMIT ?"
+        rows = self.connection.execute(query, (*arguments, limit)).fetchall()
+        values = list(zip(*rows)) if rows else [()] * len(RESULT_FIELDS)
+        return BatchStats(**{name: np.array(column, dtype=np.int64 if name.endswith('_made') else np.float64)
+                             for name, column in zip(RESULT_FIELDS, values)})
+
+    def sweep(self, columns: CandleColumns, dip_fraction: np.ndarray, profit_fraction: np.ndarray,
+              sell_fraction: np.ndarray, dollar_amount: float = 1000, workers: int = 1,
+              chunk_size: int = SWEEP_CHUNK) -> Iterator[BatchStats]:
+        # sweep_parameters over the sets not stored yet for this dataset, each chunk is committed
+        # as it arrives so a killed sweep loses at most the chunks in flight
+        dip_fraction, profit_fraction, sell_fraction = (
+            np.ravel(values).astype(np.float64) for values in
+            np.broadcast_arrays(dip_fraction, profit_fraction, sell_fraction))
+        fingerprint = columns.fingerprint
+        evaluated = self.evaluated(fingerprint, dollar_amount)
+        pending = np.array([parameters not in evaluated for parameters in
+                            zip(dip_fraction.tolist(), profit_fraction.tolist(), sell_fraction.tolist())], dtype=bool)
+        for batch in sweep_parameters(columns, dip_fraction[pending], profit_fraction[pending],
+                                      sell_fraction[pending], dollar_amount, workers, chunk_size):
+            self.record(fingerprint, batch)
+            yield batch
+
+
+@dataclass
+class HalvingRound:
+    bar_count: int
+    candidate_count: int
+
+
+@dataclass
+class HalvingResult:
+    # The survivors of the last round, best first, scored over the whole dataset
+    dip_fraction: np.ndarray
+    profit_fraction: np.ndarray
+    sell_fraction: np.ndarray
+    net_profit_loss: np.ndarray
+    rounds: List[HalvingRound]
+
+    @property
+    def simulated_bars(self) -> int:
+        return sum(halving_round.bar_count * halving_round.candidate_count for halving_round in self.rounds)
+
+
+def successive_halving(columns: CandleColumns, dip_fraction: np.ndarray, profit_fraction: np.ndarray,
+                       sell_fraction: np.ndarray, dollar_amount: float = 1000, min_bars: int = 8760,
+                       eta: int = 3, top: int = 10, workers: int = 1) -> HalvingResult:
+    # Scores every candidate on the first bars only and keeps the best 1/eta (never fewer than
+    # top) for a prefix eta times longer, until the last round runs the full dataset. A prefix
+    # run trades exactly like the start of a full run, so a bad set stops costing bars after its
+    # first short round. Cut-offs rank on net profit/loss plus the BTC still held valued at the
+    # prefix's last low, since sets that bought into a dip look worst just before it recovers;
+    # the final round ranks on net profit/loss alone like every other search
+    if eta < 2:
+        raise ValueError("Eta must be at least 2")
+    dip_fraction, profit_fraction, sell_fraction = (
+        np.ravel(values).astype(np.float64) for values in
+        np.broadcast_arrays(dip_fraction, profit_fraction, sell_fraction))
+
+    bar_counts = [len(columns)]
+    while bar_counts[0] // eta >= max(min_bars, 1):
+        bar_counts.insert(0, bar_counts[0] // eta)
+
+    candidates = np.arange(len(dip_fraction))
+    rounds = []
+    for bar_count in bar_counts:
+        batches = list(sweep_parameters(columns.slice(0, bar_count), dip_fraction[candidates],
+                                        profit_fraction[candidates], sell_fraction[candidates],
+                                        dollar_amount, workers))
+        net_profit_loss = np.concatenate([np.empty(0)] + [batch.net_profit_loss for batch in batches])
+        rounds.append(HalvingRound(bar_count, len(candidates)))
+        if bar_count == len(columns):
+            order = np.argsort(-net_profit_loss, kind='stable')
+        else:
+            final_btc_holdings = np.concatenate([np.empty(0)] + [batch.final_btc_holdings for batch in batches])
+            score = net_profit_loss + final_btc_holdings * columns.low[bar_count - 1]
+            order = np.argsort(-score, kind='stable')[:max(top, -(-len(candidates) // eta))]
+        candidates = candidates[order]
+        net_profit_loss = net_profit_loss[order]
+
+    candidates = candidates[:top]
+    return HalvingResult(dip_fraction[candidates], profit_fraction[candidates], sell_fraction[candidates],
+                         net_profit_loss[:top], rounds)
+
+
+@dataclass
+class CoarseToFineResult:
+    # The best refined sets on the full data, best first, plus how well the resampled run ranked
+    # its promising sets: the Spearman correlation of their coarse and full-resolution net
+    # profit/loss, and the share of the full-resolution top sets the coarse run had in its top
+    dip_fraction: np.ndarray
+    profit_fraction: np.ndarray
+    sell_fraction: np.ndarray
+    net_profit_loss: np.ndarray
+    coarse_bar_count: int
+    coarse_evaluated: int
+    fine_evaluated: int
+    rank_correlation: float
+    top_agreement: float
+
+
+def _refined_axis(axis: np.ndarray, subdivisions: int) -> np.ndarray:
+    # Each gap of a sorted axis split into equal steps, the original values kept exactly
+    steps = np.arange(subdivisions) / subdivisions
+    return np.append((axis[:-1, None] + np.diff(axis)[:, None] * steps).ravel(), axis[-1])
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+    return ranks
+
+
+def coarse_to_fine(columns: CandleColumns, dip_fractions: Sequence[float], profit_fractions: Sequence[float],
+                   sell_fractions: Sequence[float], dollar_amount: float = 1000, seconds: int = 86400,
+                   promising: int = 50, subdivisions: int = 2, top: int = 10, workers: int = 1) -> CoarseToFineResult:
+    # Sweeps the whole grid on candles resampled to bars of the given seconds, then takes its
+    # promising best sets to the full data together with their neighbours on a grid subdivisions
+    # times finer. Needs unix_time or date for the resampling
+    axes = [np.unique(np.asarray(axis, dtype=np.float64)) for axis in (dip_fractions, profit_fractions, sell_fractions)]
+    coarse_columns = resample_columns(columns, seconds)
+    dip_fraction, profit_fraction, sell_fraction = parameter_grid(*axes)
+    coarse_net_profit_loss = np.concatenate([np.empty(0)] + [
+        batch.net_profit_loss for batch in
+        sweep_parameters(coarse_columns, dip_fraction, profit_fraction, sell_fraction, dollar_amount, workers)])
+    best_coarse = np.argsort(-coarse_net_profit_loss, kind='stable')[:promising]
+
+    # Neighbourhoods on the finer grid, as index triples so overlapping ones merge exactly
+    fine_axes = [_refined_axis(axis, subdivisions) for axis in axes]
+    coarse_indices = np.stack(np.unravel_index(best_coarse, [len(axis) for axis in axes]), axis=1) * subdivisions
+    offsets = np.stack(np.meshgrid(*[np.arange(-subdivisions, subdivisions + 1)] * 3, indexing='ij'), axis=-1)
+    fine_indices = (coarse_indices[:, None, :] + offsets.reshape(-1, 3)[None, :, :]).reshape(-1, 3)
+    fine_indices = np.clip(fine_indices, 0, [len(axis) - 1 for axis in fine_axes])
+    fine_indices, positions = np.unique(fine_indices, axis=0, return_inverse=True)
+    positions = positions.reshape(len(best_coarse), -1)
+    fine = [axis[fine_indices[:, column]] for column, axis in enumerate(fine_axes)]
+    fine_net_profit_loss = np.concatenate([np.empty(0)] + [
+        batch.net_profit_loss for batch in
+        sweep_parameters(columns, *fine, dollar_amount, workers)])
+
+    # Agreement over the promising sets, each is the centre (offset 0) of its own neighbourhood
+    centres = positions[:, positions.shape[1] // 2]
+    coarse_scores = coarse_net_profit_loss[best_coarse]
+    full_scores = fine_net_profit_loss[centres]
+    rank_correlation = float('nan')
+    if len(best_coarse) > 1:
+        rank_correlation = float(np.corrcoef(_ranks(coarse_scores), _ranks(full_scores))[0, 1])
+    top_count = min(top, len(best_coarse))
+    full_top = set(np.argsort(-full_scores, kind='stable')[:top_count].tolist())
+    top_agreement = len(full_top & set(range(top_count))) / top_count if top_count else float('nan')
+
+    order = np.argsort(-fine_net_profit_loss, kind='stable')[:top]
+    return CoarseToFineResult(fine[0][order], fine[1][order], fine[2][order], fine_net_profit_loss[order],
+                              len(coarse_columns), len(dip_fraction), len(fine_net_profit_loss),
+                              rank_correlation, top_agreement)
+
+
+def _print_parameter_sets(dip_fraction: np.ndarray, profit_fraction: np.ndarray, sell_fraction: np.ndarray,
+                          net_profit_loss: np.ndarray):
+    for dip, profit, sell, net in zip(dip_fraction, profit_fraction, sell_fraction, net_profit_loss):
+        print(f"Dip: {dip:.4f}, Profit: {profit:.3f}, Sell: {sell:.3f}, Net profit/loss: ${net:,.2f}")
+
+
+def main():
+    # Example usage: net profit/loss over a dip x profit x sell grid, the best sets printed. Given
+    # a database path the sweep is recorded there and resumes from it when run again
+    filename = sys.argv[1] if len(sys.argv) > 1 else "Poloniex_BTCUSDT_1h.csv"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    store_path = sys.argv[3] if len(sys.argv) > 3 else None
+    dollar_amount = 1000
+    top = 10
+
+    try:
+        # Bar times are only read for resampling to daily candles
+        columns = load_btc_columns(filename, SWEEP_COLUMNS + ('unix_time',))
+        dip_fraction, profit_fraction, sell_fraction = parameter_grid(
+            np.arange(0.80, 0.995, 0.005), np.arange(1.01, 1.50, 0.01), np.arange(0.05, 1.001, 0.05))
+        print(f"Sweeping {len(dip_fraction):,} parameter sets...")
+
+        if store_path is None:
+            net_profit_loss = np.concatenate([
+                batch.net_profit_loss for batch in
+                sweep_parameters(columns, dip_fraction, profit_fraction, sell_fraction, dollar_amount, workers)])
+            order = np.argsort(-net_profit_loss, kind='stable')[:top]
+            print(f"\nTop {top} parameter sets:")
+            _print_parameter_sets(dip_fraction[order], profit_fraction[order], sell_fraction[order],
+                                  net_profit_loss[order])
+        else:
+            with SweepStore(store_path) as store:
+                computed = sum(len(batch) for batch in store.sweep(columns, dip_fraction, profit_fraction,
+                                                                   sell_fraction, dollar_amount, workers))
+                best = store.best(columns.fingerprint, top, dollar_amount)
+            print(f"{computed:,} computed, {len(dip_fraction) - computed:,} already stored")
+            print(f"\nTop {top} stored parameter sets:")
+            _print_parameter_sets(best.dip_fraction, best.profit_fraction, best.sell_fraction,
+                                  best.net_profit_loss)
+
+        # The same grid by successive halving on growing prefixes of the data
+        halving = successive_halving(columns, dip_fraction, profit_fraction, sell_fraction, dollar_amount,
+                                     top=top, workers=workers)
+        print(f"\nSuccessive halving, {halving.simulated_bars:,} bars simulated "
+              f"instead of {len(dip_fraction) * len(columns):,}:")
+        for halving_round in halving.rounds:
+            print(f"{halving_round.candidate_count:,} parameter sets over the first {halving_round.bar_count:,} bars")
+        _print_parameter_sets(halving.dip_fraction, halving.profit_fraction, halving.sell_fraction,
+                              halving.net_profit_loss)
+
+        # The same axes swept on daily candles, the promising regions refined on the full data
+        refined = coarse_to_fine(columns, np.arange(0.80, 0.995, 0.005), np.arange(1.01, 1.50, 0.01),
+                                 np.arange(0.05, 1.001, 0.05), dollar_amount, top=top, workers=workers)
+        print(f"\nCoarse to fine, {refined.coarse_evaluated:,} parameter sets over {refined.coarse_bar_count:,} "
+              f"daily bars, {refined.fine_evaluated:,} refined over {len(columns):,} bars:")
+        print(f"Rank correlation of daily and full results: {refined.rank_correlation:.3f}, "
+              f"top {top} agreement: {refined.top_agreement:.0%}")
+        _print_parameter_sets(refined.dip_fraction, refined.profit_fraction, refined.sell_fraction,
+                              refined.net_profit_loss)
+
+    except FileNotFoundError:
+        print(f"Error: Could not find file {filename}")
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
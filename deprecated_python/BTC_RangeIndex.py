@@ -0,0 +1,92 @@
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CandleRangeIndex:
+    # Segment trees over the lows (minimum) and highs (maximum) of a dataset. Built once in
+    # O(n), they answer range extremes and "next bar whose low/high crosses a price" in O(log n)
+
+    def __init__(self, high: np.ndarray, low: np.ndarray):
+        if len(high) != len(low):
+            raise ValueError("High and low columns must have the same length")
+        self.bar_count = len(high)
+        self.size = 1 << max(self.bar_count - 1, 0).bit_length()
+        self._min_low = self._build(low, np.minimum, np.inf)
+        self._max_high = self._build(high, np.maximum, -np.inf)
+
+    @classmethod
+    def from_btc_data(cls, data: Sequence) -> 'CandleRangeIndex':
+        return cls(np.array([row.high for row in data], dtype=np.float64),
+                   np.array([row.low for row in data], dtype=np.float64))
+
+    def _build(self, values: np.ndarray, combine: np.ufunc, padding: float) -> np.ndarray:
+        # Leaves live at [size, 2 * size), the parent of node i is i // 2
+        tree = np.full(2 * self.size, padding, dtype=np.float64)
+        tree[self.size:self.size + self.bar_count] = values
+        level = self.size
+        while level > 1:
+            tree[level // 2:level] = combine(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+            level //= 2
+        return tree
+
+    def _bounds(self, start: int, stop: Optional[int]) -> Tuple[int, int]:
+        stop = self.bar_count if stop is None else min(stop, self.bar_count)
+        return max(start, 0), stop
+
+    def _reduce(self, tree: np.ndarray, combine, start: int, stop: int, empty: float) -> float:
+        result = empty
+        left, right = start + self.size, stop + self.size
+        while left < right:
+            if left & 1:
+                result = combine(result, tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                result = combine(result, tree[right])
+            left >>= 1
+            right >>= 1
+        return float(result)
+
+    def _first(self, tree: np.ndarray, crosses, start: int, stop: int) -> Optional[int]:
+        # Covers [start, stop) with O(log n) nodes from left to right and descends into the
+        # first one whose extreme crosses the threshold
+        left, right = start + self.size, stop + self.size
+        right_nodes = []
+        while left < right:
+            if left & 1:
+                if crosses(tree[left]):
+                    return self._descend(tree, crosses, left)
+                left += 1
+            if right & 1:
+                right -= 1
+                right_nodes.append(right)
+            left >>= 1
+            right >>= 1
+        for node in reversed(right_nodes):
+            if crosses(tree[node]):
+                return self._descend(tree, crosses, node)
+        return None
+
+    def _descend(self, tree: np.ndarray, crosses, node: int) -> int:
+        while node < self.size:
+            node = 2 * node if crosses(tree[2 * node]) else 2 * node + 1
+        return node - self.size
+
+    def min_low(self, start: int = 0, stop: Optional[int] = None) -> float:
+        start, stop = self._bounds(start, stop)
+        return self._reduce(self._min_low, min, start, stop, np.inf)
+
+    def max_high(self, start: int = 0, stop: Optional[int] = None) -> float:
+        start, stop = self._bounds(start, stop)
+        return self._reduce(self._max_high, max, start, stop, -np.inf)
+
+    def first_low_at_or_below(self, price: float, start: int = 0, stop: Optional[int] = None) -> Optional[int]:
+        # Index of the first bar in [start, stop) whose low is <= price, None if there is none
+        start, stop = self._bounds(start, stop)
+        return self._first(self._min_low, lambda low: low <= price, start, stop)
+
+    def first_high_at_or_above(self, price: float, start: int = 0, stop: Optional[int] = None) -> Optional[int]:
+        # Index of the first bar in [start, stop) whose high is >= price, None if there is none
+        start, stop = self._bounds(start, stop)
+        return self._first(self._max_high, lambda high: high >= price, start, stop)
@@ -0,0 +1,138 @@
+import json
+import os
+import zipfile
+from collections import OrderedDict
+from dataclasses import asdict, replace
+from hashlib import sha256
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from BTC_CandleData import CandleColumns
+from BTC_DipEngine import DipTradingResult, DipTradingStats, check_parameters, simulate_dips, trade_dicts
+
+# Result files written to a cache directory, bump the version when the layout changes
+RESULT_SUFFIX = '.result.npz'
+RESULT_VERSION = 1
+
+# (dataset fingerprint, dip_fraction, profit_fraction, dollar_amount, sell_fraction)
+ResultKey = Tuple[str, float, float, float, float]
+
+
+class DipResultCache:
+    # Memoizes simulate_dips per dataset fingerprint and exact parameters: an in-memory LRU of
+    # max_entries results, backed by an optional directory of result files that is trimmed to
+    # max_bytes by dropping the least recently used. Runs continuing a DipTraderState depend on
+    # more than the parameters, so they go straight to the engine
+
+    def __init__(self, max_entries: int = 256, directory: Optional[str] = None, max_bytes: int = 256 * 2**20):
+        if max_entries < 1:
+            raise ValueError("Result cache must hold at least one entry")
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._results = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def simulate_dips(self, columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                      dollar_amount: float, sell_fraction: float) -> DipTradingResult:
+        check_parameters(dip_fraction, profit_fraction, sell_fraction)
+        key = (columns.fingerprint, float(dip_fraction), float(profit_fraction), float(dollar_amount),
+               float(sell_fraction))
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+        else:
+            result = self._read(key)
+            if result is None:
+                result = simulate_dips(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction)
+                self._write(key, result)
+            # Every caller shares the logs, so they are frozen
+            result.purchases.flags.writeable = False
+            result.sales.flags.writeable = False
+            self._results[key] = result
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return replace(result, stats=replace(result.stats))
+
+    def dip_trading_stats(self, columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                          dollar_amount: float, sell_fraction: float) -> DipTradingStats:
+        return self.simulate_dips(columns, dip_fraction, profit_fraction, dollar_amount, sell_fraction).stats
+
+    def analyze_dips_and_trade(self, columns: CandleColumns, dip_fraction: float, profit_fraction: float,
+                               dollar_amount: float, sell_fraction: float) -> Tuple[List[dict], List[dict]]:
+        # Same purchases and sales as analyze_dips_and_trade over the columns
+        return trade_dicts(columns, self.simulate_dips(columns, dip_fraction, profit_fraction, dollar_amount,
+                                                       sell_fraction))
+
+    def clear(self):
+        self._results.clear()
+        for path, _ in self._result_files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _path(self, key: ResultKey) -> str:
+        return os.path.join(self.directory, sha256(json.dumps(key).encode()).hexdigest() + RESULT_SUFFIX)
+
+    def _read(self, key: ResultKey) -> Optional[DipTradingResult]:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                source = json.loads(str(npz['__source__']))
+                if source['version'] != RESULT_VERSION or source['key'] != list(key):
+                    return None
+                result = DipTradingResult(DipTradingStats(**source['stats']), npz['purchases'], npz['sales'])
+            # Eviction goes by modification time, touching a hit keeps it recent
+            os.utime(path)
+            return result
+        except (KeyError, TypeError, ValueError, OSError, EOFError, zipfile.BadZipFile):
+            # A missing, truncated or corrupt file is a miss, the result is simulated and rewritten
+            return None
+
+    def _write(self, key: ResultKey, result: DipTradingResult):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        source = {'version': RESULT_VERSION, 'key': list(key), 'stats': asdict(result.stats)}
+        try:
+            with open(temp_path, 'wb') as file:
+                np.savez(file, __source__=np.array(json.dumps(source)), purchases=result.purchases,
+                         sales=result.sales)
+            os.replace(temp_path, path)
+        except OSError:
+            # The disk tier is an optimization only, a full or read-only directory must not break runs
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict()
+
+    def _result_files(self) -> List[Tuple[str, os.stat_result]]:
+        if self.directory is None:
+            return []
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(RESULT_SUFFIX):
+                    try:
+                        files.append((entry.path, entry.stat()))
+                    except OSError:
+                        pass
+        return files
+
+    def _evict(self):
+        files = sorted(self._result_files(), key=lambda file: file[1].st_mtime_ns)
+        total_bytes = sum(stat.st_size for _, stat in files)
+        for path, stat in files:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_bytes -= stat.st_size
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from BTC_CandleData import load_btc_columns
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'Poloniex_BTCUSDT_1h.csv')
+
+
+@pytest.fixture(scope='session')
+def csv_path():
+    return CSV_PATH
+
+
+@pytest.fixture(scope='session')
+def columns(csv_path):
+    # 20000 hourly candles spanning both rallies and deep drawdowns, every column parsed straight
+    # from the CSV so no test depends on a cache left beside it
+    return load_btc_columns(csv_path, use_cache=False, dates_from_unix=True).slice(30000, 50000)
+
+
+@pytest.fixture
+def small_csv(csv_path, tmp_path):
+    # The first 500 candles in a directory of their own, so caches written beside them are the test's
+    with open(csv_path, 'r', newline='') as file:
+        lines = [next(file) for _ in range(501)]
+    path = tmp_path / 'candles.csv'
+    path.write_text(''.join(lines))
+    return str(path)
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pytest
+
+import BTC_CandleData
+from BTC_CandleData import load_btc_columns
+from BTC_DipAnalysis import load_btc_data
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    # The projections load_btc_columns had to parse from the CSV
+    calls = []
+    parse = BTC_CandleData._parse_btc_columns
+
+    def recording_parse(filename, dates_from_unix=False, columns=None, workers=1):
+        calls.append(tuple(columns))
+        return parse(filename, dates_from_unix, columns, workers)
+
+    monkeypatch.setattr(BTC_CandleData, '_parse_btc_columns', recording_parse)
+    return calls
+
+
+def assert_same_columns(loaded, expected):
+    assert loaded.column_names() == expected.column_names()
+    assert loaded.symbol == expected.symbol
+    for name in expected.column_names():
+        assert np.array_equal(getattr(loaded, name), getattr(expected, name))
+
+
+def test_alternating_projections_share_the_cache(small_csv, parse_calls):
+    for columns in (('high', 'low'), ('close',), ('high', 'low'), ('close',), ('low', 'close')):
+        assert_same_columns(load_btc_columns(small_csv, columns),
+                            load_btc_columns(small_csv, columns, use_cache=False))
+    # Each column is parsed once for the cache, the uncached loads account for the rest
+    assert parse_calls[:3] == [('high', 'low'), ('high', 'low'), ('close',)]
+    assert len(parse_calls) == 7
+
+
+@pytest.mark.parametrize('columns, dates_from_unix', [
+    (None, False),
+    (['symbol', 'high'], False),
+    (['symbol'], False),
+    (['date'], True),
+    (['date'], False),
+    (['unix_time', 'low', 'trade_count'], False),
+])
+def test_load_btc_data_projection_ignores_the_cache(small_csv, columns, dates_from_unix):
+    uncached = load_btc_data(small_csv, use_cache=False, dates_from_unix=dates_from_unix, columns=columns)
+    assert len(uncached) == 500
+    # Once to write the cache and once to read it back
+    for _ in range(2):
+        assert load_btc_data(small_csv, dates_from_unix=dates_from_unix, columns=columns) == uncached
+
+
+@pytest.mark.parametrize('damage', [
+    lambda content: b'',
+    lambda content: content[:200],
+    lambda content: content[:100] + bytes(len(content) - 200) + content[-100:],
+    lambda content: b'not a cache file',
+], ids=['empty', 'truncated', 'corrupt', 'not-a-zip'])
+def test_damaged_cache_is_a_miss(small_csv, parse_calls, damage):
+    expected = load_btc_columns(small_csv, use_cache=False)
+    load_btc_columns(small_csv)
+    cache_path = small_csv + BTC_CandleData.CACHE_SUFFIX
+    with open(cache_path, 'rb') as file:
+        content = file.read()
+    with open(cache_path, 'wb') as file:
+        file.write(damage(content))
+
+    assert_same_columns(load_btc_columns(small_csv), expected)
+    # The damaged file was replaced, the next load reads it back without parsing
+    assert_same_columns(load_btc_columns(small_csv), expected)
+    assert len(parse_calls) == 3
+
+
+@pytest.fixture
+def appended_csv(small_csv, csv_path):
+    # small_csv cached at 400 candles, then grown to 500 as an hourly export would be
+    with open(small_csv, 'r', newline='') as file:
+        lines = file.readlines()
+    with open(small_csv, 'w', newline='') as file:
+        file.writelines(lines[:401])
+    load_btc_columns(small_csv, dates_from_unix=True)
+    with open(small_csv, 'a', newline='') as file:
+        file.writelines(lines[401:])
+    return small_csv
+
+
+def test_appended_rows_extend_the_cache(appended_csv, parse_calls):
+    expected = load_btc_columns(appended_csv, use_cache=False, dates_from_unix=True)
+    assert len(expected) == 500
+    for columns in (None, ('high', 'low'), None):
+        loaded = load_btc_columns(appended_csv, columns, dates_from_unix=True)
+        assert_same_columns(loaded, expected if columns is None else load_btc_columns(
+            appended_csv, columns, use_cache=False, dates_from_unix=True))
+    # Only the uncached loads parsed the CSV
+    assert parse_calls == [BTC_CandleData.COLUMN_NAMES, ('high', 'low')]
+
+
+def test_rewritten_tail_is_parsed_again(appended_csv, parse_calls):
+    with open(appended_csv, 'r', newline='') as file:
+        lines = file.readlines()
+    lines[400] = lines[400].replace(',', ',9', 1)
+    with open(appended_csv, 'w', newline='') as file:
+        file.writelines(lines)
+    assert_same_columns(load_btc_columns(appended_csv, dates_from_unix=True),
+                        load_btc_columns(appended_csv, use_cache=False, dates_from_unix=True))
+    assert len(parse_calls) == 2
+
+
+def test_extended_cache_survives_a_new_mtime(appended_csv, parse_calls):
+    load_btc_columns(appended_csv, dates_from_unix=True)
+    stat = os.stat(appended_csv)
+    os.utime(appended_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    # Without a content hash the cache can't vouch for the file any more, it is parsed once and re-hashed
+    for _ in range(2):
+        assert_same_columns(load_btc_columns(appended_csv, ('high', 'low'), dates_from_unix=True),
+                            load_btc_columns(appended_csv, ('high', 'low'), use_cache=False))
+    assert parse_calls == [('high', 'low')] * 3
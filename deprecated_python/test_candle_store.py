@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from BTC_CandleData import csv_to_candle_store, load_btc_columns, open_candle_store, refresh_candle_store
+
+
+@pytest.fixture
+def unterminated_csv(small_csv):
+    # The same candles with no newline after the last row
+    with open(small_csv, 'r', newline='') as file:
+        content = file.read()
+    with open(small_csv, 'w', newline='') as file:
+        file.write(content.rstrip('\n'))
+    return small_csv
+
+
+def assert_same_rows(store, loaded):
+    assert len(store) == len(loaded)
+    for name in ('unix_time', 'high', 'low', 'close'):
+        assert np.array_equal(getattr(store, name), getattr(loaded, name))
+
+
+def test_conversion_keeps_unterminated_last_row(unterminated_csv, tmp_path):
+    path = str(tmp_path / 'candles.store')
+    csv_to_candle_store(unterminated_csv, path)
+    assert_same_rows(open_candle_store(path), load_btc_columns(unterminated_csv, use_cache=False))
+
+
+def test_refresh_keeps_unterminated_last_row(unterminated_csv, tmp_path):
+    path = str(tmp_path / 'candles.store')
+    loaded = load_btc_columns(unterminated_csv, use_cache=False)
+    assert_same_rows(refresh_candle_store(unterminated_csv, path), loaded)
+    assert_same_rows(refresh_candle_store(unterminated_csv, path), loaded)
+
+
+def test_refresh_waits_for_a_row_being_written(unterminated_csv, tmp_path):
+    path = str(tmp_path / 'candles.store')
+    with open(unterminated_csv, 'a') as file:
+        file.write('\n')
+    refresh_candle_store(unterminated_csv, path)
+    with open(unterminated_csv, 'r') as file:
+        last = file.read().splitlines()[-1].split(',')
+    last[0] = str(int(last[0]) + 3600000)
+    row = ','.join(last)
+
+    with open(unterminated_csv, 'a') as file:
+        file.write(row[:10])
+    assert len(refresh_candle_store(unterminated_csv, path)) == 500
+    with open(unterminated_csv, 'a') as file:
+        file.write(row[10:] + '\n')
+    assert_same_rows(refresh_candle_store(unterminated_csv, path), load_btc_columns(unterminated_csv, use_cache=False))
+
+
+def test_columns_compare_by_identity(columns):
+    head = columns.slice(0, 10)
+    assert head == head
+    assert head != columns.slice(0, 10)
+    assert columns.slice(0, 10) not in [head, columns]
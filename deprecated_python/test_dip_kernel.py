@@ -0,0 +1,111 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import BTC_DipEngine
+from BTC_CandleData import open_candle_store, write_candle_store
+from BTC_DipAnalysis import analyze_dips_and_trade, btc_data_from_columns, summarize_dips_and_trade
+from BTC_DipEngine import (DipTraderState, DipTradingStats, dip_trading_stats, simulate_dip_kernel, simulate_dips,
+                           simulate_parameter_batch, trade_date)
+
+# (dip_fraction, profit_fraction, dollar_amount, sell_fraction), in analyze_dips_and_trade order
+GRID = [(dip, profit, 100.0, sell) for dip, profit, sell in
+        itertools.product((0.7, 0.9, 0.97), (1.01, 1.2), (0.1, 1.0))]
+
+
+@pytest.fixture(scope='module')
+def rows(columns):
+    return btc_data_from_columns(columns)
+
+
+@pytest.fixture(scope='module')
+def store(columns, tmp_path_factory):
+    # The same candles memory-mapped from a store
+    path = str(tmp_path_factory.mktemp('store') / 'candles.store')
+    write_candle_store(columns, path)
+    return open_candle_store(path)
+
+
+@pytest.fixture(params=[True, False], ids=['jit', 'python'])
+def kernel(request, monkeypatch):
+    # The kernel as compiled, and as the plain Python it falls back to
+    if not request.param:
+        monkeypatch.setattr(BTC_DipEngine, 'JIT_AVAILABLE', False)
+        for name in ('_log_trade', '_dip_kernel'):
+            function = getattr(BTC_DipEngine, name)
+            monkeypatch.setattr(BTC_DipEngine, name, getattr(function, 'py_func', function))
+    elif not BTC_DipEngine.JIT_AVAILABLE:
+        pytest.skip("Numba is not available")
+    return simulate_dip_kernel
+
+
+def assert_same_trades(columns, trade_log, trades, btc, dollars, btc_holdings, first_index=0):
+    # Log indices count from the start of the simulated columns, first_index bars into columns
+    assert len(trade_log) == len(trades)
+    for logged, trade in zip(trade_log, trades):
+        assert trade_date(columns, int(logged['index']) + first_index) == trade['date']
+        assert logged['price'] == trade['price']
+        assert logged['all_time_high'] == trade['all_time_high']
+        assert logged['btc'] == trade[btc]
+        assert logged['dollars'] == trade[dollars]
+        assert logged['btc_holdings'] == trade[btc_holdings]
+
+
+def assert_same_result(columns, result, purchases, sales, first_index=0):
+    assert result.stats == DipTradingStats.from_trades(purchases, sales)
+    assert_same_trades(columns, result.purchases, purchases, 'btc_purchased', 'dollars_spent',
+                       'total_btc_after_purchase', first_index)
+    assert_same_trades(columns, result.sales, sales, 'btc_sold', 'dollars_received', 'btc_remaining', first_index)
+
+
+@pytest.mark.parametrize('parameters', GRID)
+def test_kernel_matches_row_engine(kernel, columns, rows, parameters):
+    purchases, sales = analyze_dips_and_trade(rows, *parameters)
+    result = kernel(columns, *parameters)
+    assert_same_result(columns, result, purchases, sales)
+    assert BTC_DipEngine._simulate_events(columns, *parameters, DipTraderState()) == result.stats
+    assert analyze_dips_and_trade(columns, *parameters) == (purchases, sales)
+    assert simulate_dips(columns, *parameters).stats == result.stats
+    assert dip_trading_stats(columns, *parameters) == result.stats
+    assert summarize_dips_and_trade(iter(rows), *parameters) == result.stats
+
+
+@pytest.mark.parametrize('parameters', GRID[::3])
+def test_kernel_resumes_split_run(kernel, columns, rows, parameters):
+    state = DipTraderState()
+    purchases, sales = analyze_dips_and_trade(rows, *parameters, state)
+
+    split = len(columns) // 3
+    resumed = DipTraderState()
+    first = kernel(columns.slice(0, split), *parameters, resumed)
+    second = kernel(columns.slice(resumed.bars_processed), *parameters, resumed)
+    assert resumed == state
+    summarized = DipTraderState()
+    assert summarize_dips_and_trade(rows[:split], *parameters, summarized) == first.stats
+    assert summarize_dips_and_trade(rows[split:], *parameters, summarized) == second.stats
+    assert summarized == state
+    assert_same_result(columns, first, purchases[:len(first.purchases)], sales[:len(first.sales)])
+    assert_same_result(columns, second, purchases[len(first.purchases):], sales[len(first.sales):], split)
+
+
+@pytest.mark.parametrize('parameters', GRID[::3])
+def test_memory_mapped_store_matches_row_engine(kernel, store, rows, parameters):
+    assert store.memory_mapped
+
+    purchases, sales = analyze_dips_and_trade(rows, *parameters)
+    stats = DipTradingStats.from_trades(purchases, sales)
+    store_stats = DipTradingStats()
+    assert analyze_dips_and_trade(store, *parameters, stats=store_stats) == (purchases, sales)
+    assert store_stats == stats
+    assert dip_trading_stats(store, *parameters) == stats
+    assert simulate_dips(store, *parameters).stats == stats
+    assert 'range_index' not in vars(store) and 'all_time_high' not in vars(store)
+
+
+def test_parameter_batch_matches_row_engine(columns, rows):
+    # Every set of the grid in one pass, each exactly equal to its own row-engine run
+    batch = simulate_parameter_batch(columns, *np.array(GRID).T)
+    assert len(batch) == len(GRID)
+    for index, parameters in enumerate(GRID):
+        assert batch[index] == DipTradingStats.from_trades(*analyze_dips_and_trade(rows, *parameters))
@@ -0,0 +1,28 @@
+import math
+
+import pytest
+
+import BTC_ParameterOptimization
+from BTC_ParameterOptimization import net_profit_loss, optimize_parameters
+
+
+@pytest.mark.parametrize('start', [
+    {'dip_fraction': 0.995},
+    {'dip_fraction': 0.995, 'profit_fraction': 1.0005},
+], ids=['dip-near-1', 'dip-and-profit-near-1'])
+def test_rejected_probes_keep_parameters_finite(columns, monkeypatch, start):
+    # The upper dip probe starts beyond what the trader accepts, which used to make every later step NaN
+    evaluated = []
+
+    def recording_net_profit_loss(data, parameters):
+        evaluated.append(parameters)
+        return net_profit_loss(data, parameters)
+
+    monkeypatch.setattr(BTC_ParameterOptimization, 'net_profit_loss', recording_net_profit_loss)
+    result = optimize_parameters(columns, learning_rate=0.01, max_iterations=20, convergence_threshold=1e-9,
+                                 **start)
+    assert all(math.isfinite(value) for parameters in evaluated for value in parameters)
+    assert result.iterations == 20
+    # The optimizer's defaults fill in the rest of the starting point
+    starting = (start['dip_fraction'], start.get('profit_fraction', 1.05), 1000, 0.25)
+    assert result.net_profit_loss >= net_profit_loss(columns, starting)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from BTC_ParameterSweep import SweepStore, parameter_grid, sweep_parameters
+
+
+def swept_sets(batches):
+    return [parameters for batch in batches for parameters in
+            zip(batch.dip_fraction.tolist(), batch.profit_fraction.tolist(), batch.sell_fraction.tolist())]
+
+
+def test_reopened_store_resumes_the_sweep(columns, tmp_path):
+    path = str(tmp_path / 'sweep.sqlite')
+    grid = parameter_grid([0.8, 0.9, 0.95, 0.98], [1.01, 1.05, 1.2], [0.1, 0.5, 1.0])
+    every_set = list(zip(*(axis.tolist() for axis in grid)))
+    prefix = 17
+
+    # An interrupted sweep, only the first sets got stored, in chunks that don't divide the grid
+    with SweepStore(path) as store:
+        first = swept_sets(store.sweep(columns, *(axis[:prefix] for axis in grid), dollar_amount=100, chunk_size=5))
+    assert first == every_set[:prefix]
+
+    with SweepStore(path) as store:
+        resumed = swept_sets(store.sweep(columns, *grid, dollar_amount=100, chunk_size=5))
+        assert resumed == every_set[prefix:]
+        assert swept_sets(store.sweep(columns, *grid, dollar_amount=100)) == []
+        best = store.best(columns.fingerprint, limit=len(every_set), dollar_amount=100)
+
+    # The stored ranking is the one a single uninterrupted sweep gives, ties broken by parameters
+    full = list(sweep_parameters(columns, *grid, dollar_amount=100))
+    net_profit_loss = np.concatenate([batch.net_profit_loss for batch in full])
+    order = np.lexsort((grid[2], grid[1], grid[0], -net_profit_loss))
+    assert swept_sets([best]) == [every_set[index] for index in order]
+    assert best.net_profit_loss.tolist() == net_profit_loss[order].tolist()
+    assert best.purchases_made.tolist() == np.concatenate([batch.purchases_made for batch in full])[order].tolist()
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from BTC_DipAnalysis import btc_data_from_columns
+from BTC_RangeIndex import CandleRangeIndex
+
+
+def brute_first(values, crosses, start, stop):
+    return next((index for index in range(start, stop) if crosses(values[index])), None)
+
+
+@pytest.mark.parametrize('bar_count', [0, 1, 2, 3, 7, 8, 9, 100, 129])
+def test_queries_match_brute_force(bar_count):
+    # Rounded prices so thresholds and ranges hit ties as well as strict crossings
+    rng = np.random.default_rng(bar_count)
+    low = np.round(rng.uniform(0, 20, bar_count))
+    high = low + np.round(rng.uniform(0, 10, bar_count))
+    index = CandleRangeIndex(high, low)
+
+    ranges = [(start, stop) for start in range(bar_count + 1) for stop in range(start, bar_count + 1)]
+    if len(ranges) > 400:
+        ranges = [ranges[position] for position in rng.choice(len(ranges), 400, replace=False)]
+    ranges += [(0, None), (bar_count, bar_count), (0, bar_count + 5)]
+    for start, stop in ranges:
+        end = bar_count if stop is None else min(stop, bar_count)
+        assert index.min_low(start, stop) == min(low[start:end], default=np.inf)
+        assert index.max_high(start, stop) == max(high[start:end], default=-np.inf)
+        for price in rng.integers(-1, 32, 4):
+            assert index.first_low_at_or_below(price, start, stop) == brute_first(
+                low, lambda value: value <= price, start, end)
+            assert index.first_high_at_or_above(price, start, stop) == brute_first(
+                high, lambda value: value >= price, start, end)
+
+
+def test_from_btc_data_matches_columns(columns):
+    head = columns.slice(0, 1000)
+    from_rows = CandleRangeIndex.from_btc_data(btc_data_from_columns(head))
+    from_columns = CandleRangeIndex(head.high, head.low)
+    assert from_rows.bar_count == from_columns.bar_count == 1000
+    assert from_rows.min_low() == from_columns.min_low() == head.low.min()
+    assert from_rows.max_high(100, 900) == from_columns.max_high(100, 900) == head.high[100:900].max()
+    price = float(np.median(head.low))
+    assert from_rows.first_low_at_or_below(price, 500) == from_columns.first_low_at_or_below(price, 500)
+
+
+def test_mismatched_lengths_are_rejected():
+    with pytest.raises(ValueError):
+        CandleRangeIndex(np.zeros(3), np.zeros(2))
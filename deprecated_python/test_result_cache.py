@@ -0,0 +1,103 @@
+import glob
+import os
+
+import pytest
+
+import BTC_ResultCache
+from BTC_ResultCache import DipResultCache
+
+PARAMETERS = (0.9, 1.1, 100.0, 0.5)
+# Distinct parameter sets, in the order they are first simulated
+SETS = [(dip, 1.1, 100.0, 0.5) for dip in (0.8, 0.85, 0.9, 0.95)]
+
+
+@pytest.fixture
+def simulated(monkeypatch):
+    # The dip fractions the cache actually simulated, rather than served
+    calls = []
+
+    def recording_simulate_dips(columns, *parameters):
+        calls.append(parameters[0])
+        return simulate_dips(columns, *parameters)
+
+    simulate_dips = BTC_ResultCache.simulate_dips
+    monkeypatch.setattr(BTC_ResultCache, 'simulate_dips', recording_simulate_dips)
+    return calls
+
+
+def result_path(cache, columns, parameters):
+    return cache._path((columns.fingerprint,) + tuple(float(value) for value in parameters))
+
+
+@pytest.mark.parametrize('damage', [
+    lambda content: b'',
+    lambda content: content[:200],
+    lambda content: content[:100] + bytes(len(content) - 200) + content[-100:],
+    lambda content: b'not a result file',
+], ids=['empty', 'truncated', 'corrupt', 'not-a-zip'])
+def test_damaged_result_file_is_a_miss(columns, tmp_path, damage):
+    expected = DipResultCache(directory=str(tmp_path)).simulate_dips(columns, *PARAMETERS)
+    path, = glob.glob(str(tmp_path / '*.result.npz'))
+    with open(path, 'rb') as file:
+        content = file.read()
+    with open(path, 'wb') as file:
+        file.write(damage(content))
+
+    result = DipResultCache(directory=str(tmp_path)).simulate_dips(columns, *PARAMETERS)
+    assert result.stats == expected.stats
+    assert result.purchases.tolist() == expected.purchases.tolist()
+    assert result.sales.tolist() == expected.sales.tolist()
+
+
+def test_max_entries_drops_least_recently_used(columns, simulated):
+    cache = DipResultCache(max_entries=2)
+    first, second, third, _ = SETS
+    cache.simulate_dips(columns, *first)
+    cache.simulate_dips(columns, *second)
+    # The hit makes the first set the most recent, so the third evicts the second
+    cache.simulate_dips(columns, *first)
+    cache.simulate_dips(columns, *third)
+    assert simulated == [first[0], second[0], third[0]]
+
+    cache.simulate_dips(columns, *third)
+    cache.simulate_dips(columns, *first)
+    assert simulated == [first[0], second[0], third[0]]
+    cache.simulate_dips(columns, *second)
+    assert simulated == [first[0], second[0], third[0], second[0]]
+    assert len(cache._results) == 2
+
+
+def test_max_bytes_drops_least_recently_used_files(columns, tmp_path, simulated):
+    directory = str(tmp_path)
+    first, second, third, fourth = SETS
+    cache = DipResultCache(directory=directory)
+    for parameters in SETS[:3]:
+        cache.simulate_dips(columns, *parameters)
+    paths = [result_path(cache, columns, parameters) for parameters in SETS]
+    sizes = []
+    for age, path in enumerate(paths[:3]):
+        # Well separated modification times, oldest first, whatever the clock resolution
+        os.utime(path, (1000 * (age + 1), 1000 * (age + 1)))
+        sizes.append(os.path.getsize(path))
+
+    # Reading the oldest file from a new process touches it, leaving the second as the oldest
+    reader = DipResultCache(directory=directory)
+    reader.simulate_dips(columns, *first)
+    assert simulated == [first[0], second[0], third[0]]
+
+    # Room for everything but the second file once the fourth is written
+    sizing = DipResultCache(directory=str(tmp_path / 'sizing'))
+    sizing.simulate_dips(columns, *fourth)
+    sizes.append(os.path.getsize(result_path(sizing, columns, fourth)))
+    bounded = DipResultCache(directory=directory, max_bytes=sizes[0] + sizes[2] + sizes[3])
+    bounded.simulate_dips(columns, *fourth)
+    assert [os.path.exists(path) for path in paths] == [True, False, True, True]
+    assert sum(os.path.getsize(path) for path in glob.glob(str(tmp_path / '*.result.npz'))) <= bounded.max_bytes
+
+    # The evicted result is simulated again, the kept ones are read back
+    fresh = DipResultCache(directory=directory, max_bytes=bounded.max_bytes)
+    for parameters in (first, third, fourth):
+        fresh.simulate_dips(columns, *parameters)
+    assert simulated == [first[0], second[0], third[0], fourth[0], fourth[0]]
+    fresh.simulate_dips(columns, *second)
+    assert simulated == [first[0], second[0], third[0], fourth[0], fourth[0], second[0]]